@@ -1,8 +1,10 @@
 # backend/app/api/chat.py
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from ..models.chat import ChatRequest, ChatResponse
-from ..services import chat_service
+from ..services import admission, chat_service
+from ..services.batching import QueueFullError
+from .streaming import sse_response
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -10,13 +12,33 @@ logger = logging.getLogger(__name__)
 @router.post("", response_model=ChatResponse)
 async def handle_chat_message(request: ChatRequest):
     """Receives a chat message and returns the model's response."""
-    logger.info(f"Received chat request for model: {request.model_id}")
+    logger.debug("Received chat request for model: %s", request.model_id)
+    deadline = admission.deadline_for(request.priority, request.timeout_s)
     try:
-        response_text = await chat_service.generate_response(
-            model_id=request.model_id,
-            prompt=request.message
-        )
-        return ChatResponse(response=response_text, model_id=request.model_id)
+        if request.session_id:
+            response_text = await chat_service.generate_session_response(
+                model_id=request.model_id,
+                session_id=request.session_id,
+                message=request.message,
+                use_cache=request.use_cache,
+                priority=request.priority,
+                deadline=deadline,
+            )
+        else:
+            response_text = await chat_service.generate_response(
+                model_id=request.model_id,
+                prompt=request.message,
+                use_cache=request.use_cache,
+                priority=request.priority,
+                deadline=deadline,
+            )
+        return ChatResponse(response=response_text, model_id=request.model_id, session_id=request.session_id)
+    except admission.OverloadedError as oe:
+         logger.warning("Shedding chat request: %s", oe)
+         raise HTTPException(status_code=503, detail=str(oe), headers={"Retry-After": str(oe.retry_after_s)})
+    except QueueFullError as qe:
+         logger.warning("Rejecting chat request: %s", qe)
+         raise HTTPException(status_code=503, detail=str(qe)) # too many queued requests
     except ValueError as ve:
          logger.warning(f"Value error in chat request: {ve}")
          raise HTTPException(status_code=404, detail=str(ve)) # e.g., model not found
@@ -25,4 +47,60 @@ async def handle_chat_message(request: ChatRequest):
          raise HTTPException(status_code=500, detail=str(re)) # e.g., model loading failed
     except Exception as e:
         logger.error(f"Unexpected error in chat endpoint: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="An unexpected error occurred")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An unexpected error occurred")
+
+@router.post("/stream")
+async def stream_chat_message(request: ChatRequest, http_request: Request):
+    """Streams the model's response as server-sent `token` events."""
+    logger.debug("Received streaming chat request for model: %s", request.model_id)
+    try:
+        # Admission happens here, so a shed request gets a real 503 instead of an in-stream error
+        chunks = await chat_service.stream_response(
+            model_id=request.model_id,
+            prompt=request.message,
+            priority=request.priority,
+            deadline=admission.deadline_for(request.priority, request.timeout_s),
+        )
+    except admission.OverloadedError as oe:
+         logger.warning("Shedding streaming chat request: %s", oe)
+         raise HTTPException(status_code=503, detail=str(oe), headers={"Retry-After": str(oe.retry_after_s)})
+    except ValueError as ve:
+         raise HTTPException(status_code=404, detail=str(ve)) # e.g., model not found
+    return sse_response(http_request, chunks, request.model_id)
+
+
+@router.get("/batching")
+async def get_batching_stats():
+    """Returns per-model batching queue depth and mean batch size."""
+    return chat_service.get_batching_stats()
+
+
+@router.get("/admission")
+async def get_admission_stats():
+    """Returns per-model admission slots, queued requests by priority and shed counts."""
+    return admission.get_admission_stats()
+
+
+@router.get("/speculative")
+async def get_speculative_stats():
+    """Returns draft-token acceptance rate and tokens per target pass for models with a draft model."""
+    return chat_service.get_speculative_stats()
+
+
+@router.get("/workers")
+async def get_worker_pool_stats():
+    """Returns per-worker outstanding requests for models served by inference worker pools."""
+    return chat_service.get_worker_pool_stats()
+
+
+@router.get("/sessions")
+async def get_session_stats():
+    """Returns chat session count, KV-cache memory and reused/encoded token counters."""
+    return chat_service.get_session_stats()
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Ends a chat session, freeing its history and KV cache."""
+    if not chat_service.delete_session(session_id):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return {"session_id": session_id, "deleted": True}
@@ -0,0 +1,92 @@
+# backend/app/api/evaluate.py
+import logging
+from typing import List
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from ..models.evaluation import EvaluationRequest, EvaluationResponse, BatchEvaluationRequest, BatchJobStatus
+from ..services import admission, eval_jobs, llm_service
+from .streaming import sse_event, sse_response
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.post("", response_model=EvaluationResponse)
+async def evaluate(request: EvaluationRequest):
+    """Evaluates a prompt against a remote/provider model (openai/, huggingface/, local/)."""
+    response_text = await llm_service.evaluate_model(
+        request.model_id,
+        request.prompt,
+        request.config,
+        use_cache=request.use_cache,
+        priority=request.priority,
+        deadline=admission.deadline_for(request.priority, request.timeout_s),
+    )
+    return EvaluationResponse(response=response_text, model_id=request.model_id)
+
+@router.post("/stream")
+async def evaluate_stream(request: EvaluationRequest, http_request: Request):
+    """Streams a provider model's response as server-sent `token` events."""
+    chunks = await llm_service.stream_model( # Raises 503 + Retry-After before the response starts if shed
+        request.model_id,
+        request.prompt,
+        request.config,
+        priority=request.priority,
+        deadline=admission.deadline_for(request.priority, request.timeout_s),
+    )
+    return sse_response(http_request, chunks, request.model_id)
+
+
+@router.post("/jobs", response_model=BatchJobStatus, status_code=202)
+async def create_evaluation_job(request: BatchEvaluationRequest):
+    """Starts evaluating every prompt against every model in the background.
+
+    Passing the `job_id` of an earlier job resumes it: pairs that already
+    succeeded in its results file are not re-evaluated.
+    """
+    job = eval_jobs.start_job(request)
+    logger.info("Started evaluation job %s: %d pairs, %d already done", job.job_id, job.total, job.skipped)
+    return job.status()
+
+@router.get("/jobs", response_model=List[BatchJobStatus])
+async def list_evaluation_jobs():
+    """Lists jobs started since the backend came up."""
+    return eval_jobs.list_jobs()
+
+@router.get("/jobs/{job_id}", response_model=BatchJobStatus)
+async def get_evaluation_job(job_id: str):
+    return eval_jobs.get_job(job_id).status()
+
+@router.post("/jobs/{job_id}/resume", response_model=BatchJobStatus, status_code=202)
+async def resume_evaluation_job(job_id: str):
+    """Restarts a job from its saved manifest (e.g. after a backend restart)."""
+    return eval_jobs.resume_job(job_id).status()
+
+@router.delete("/jobs/{job_id}", response_model=BatchJobStatus)
+async def cancel_evaluation_job(job_id: str):
+    """Cancels a running job; it can be resumed later."""
+    job = eval_jobs.get_job(job_id)
+    job.cancel()
+    return job.status()
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_evaluation_job(job_id: str, http_request: Request):
+    """Streams each finished pair as a `result` event, then a final `done` event with the job status."""
+    job = eval_jobs.get_job(job_id)
+
+    async def event_stream():
+        results = job.subscribe()
+        try:
+            async for record in results:
+                if await http_request.is_disconnected():
+                    break
+                yield sse_event("result", record)
+            else:
+                yield sse_event("done", job.status().model_dump())
+        finally:
+            await results.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
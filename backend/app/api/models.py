@@ -1,13 +1,53 @@
 # backend/app/api/models.py
-from fastapi import APIRouter, HTTPException
-from typing import List
-from ..core.config import AVAILABLE_MODELS
-from ..models.chat import ModelInfo # Reusing ModelInfo from chat models
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from ..core.registry import RUNTIMES, get_registry
+from ..models.model import ModelInfo
+from ..services import chat_service, llm_service
 
 router = APIRouter()
 
 @router.get("", response_model=List[ModelInfo])
-async def get_available_models():
-    """Returns a list of currently configured models."""
-    # Convert the config dict list to ModelInfo objects
-    return [ModelInfo(id=m["id"], name=m["name"]) for m in AVAILABLE_MODELS]
\ No newline at end of file
+async def get_available_models(
+    runtime: Optional[str] = Query(None, description=f"Only list models of this runtime ({', '.join(RUNTIMES)})"),
+):
+    """Returns the registered models with their deployment and runtime state."""
+    if runtime is not None and runtime not in RUNTIMES:
+        raise HTTPException(status_code=400, detail=f"Unknown runtime '{runtime}'")
+    return await llm_service.get_available_models(runtime)
+
+@router.get("/cache")
+async def get_model_cache_stats():
+    """Returns memory usage and hit/miss/eviction counters of the local model cache."""
+    return chat_service.get_cache_stats()
+
+
+@router.get("/status")
+async def get_model_load_status():
+    """Returns load progress (loading/loaded/failed, elapsed time, waiters) per model."""
+    return chat_service.get_load_status()
+
+
+@router.get("/registry")
+async def get_registry_stats():
+    """Returns the registry file, model count, reload count and last parse error."""
+    return get_registry().stats()
+
+
+@router.post("/reload")
+async def reload_registry():
+    """Re-reads the model registry file now instead of waiting for the change check."""
+    get_registry().reload()
+    return get_registry().stats()
+
+
+@router.post("/{model_id:path}/deploy", response_model=ModelInfo)
+async def deploy_model(model_id: str):
+    """Marks a model deployed; local models are pinned and preloaded in the background."""
+    return await llm_service.set_model_deployment_status(model_id, True)
+
+
+@router.post("/{model_id:path}/undeploy", response_model=ModelInfo)
+async def undeploy_model(model_id: str):
+    """Marks a model undeployed; local models are unpinned and unloaded."""
+    return await llm_service.set_model_deployment_status(model_id, False)
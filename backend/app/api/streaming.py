@@ -0,0 +1,44 @@
+# backend/app/api/streaming.py
+import json
+import logging
+from typing import AsyncIterator
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+def sse_event(event: str, data: dict) -> str:
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(request: Request, chunks: AsyncIterator[str], model_id: str) -> StreamingResponse:
+    """
+    Wraps a text-chunk iterator as a text/event-stream response.
+    Emits `token` events, then a final `done` (or `error`) event. The
+    iterator is closed as soon as the client disconnects so the underlying
+    generation is cancelled.
+    """
+    async def event_stream():
+        try:
+            async for chunk in chunks:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, cancelling stream for %s", model_id)
+                    break
+                yield sse_event("token", {"token": chunk})
+            else:
+                yield sse_event("done", {"model_id": model_id})
+        except HTTPException as he:
+            yield sse_event("error", {"status_code": he.status_code, "detail": he.detail})
+        except ValueError as ve:
+            yield sse_event("error", {"status_code": 404, "detail": str(ve)})
+        except Exception as e:
+            logger.error("Unexpected error while streaming %s: %s", model_id, e, exc_info=True)
+            yield sse_event("error", {"status_code": 500, "detail": "An unexpected error occurred"})
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, # Don't let nginx buffer tokens
+    )
@@ -1,44 +1,113 @@
 # backend/app/core/config.py
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
-# Define our initial, simple list of models
-# Using smaller models for easier download and lower resource usage initially
-AVAILABLE_MODELS = [
-    {
-        "id": "google/flan-t5-small",
-        "name": "Flan-T5 Small (Google)",
-        "source": "huggingface",
-        "pipeline_kwargs": {"max_new_tokens": 100} # Example specific args
-    },
-    {
-        "id": "distilgpt2",
-        "name": "DistilGPT-2 (Hugging Face)",
-        "source": "huggingface",
-        "pipeline_kwargs": {"max_new_tokens": 50}
-    },
-    # { # Example for later API integration (requires .env setup)
-    #     "id": "openai/gpt-3.5-turbo",
-    #     "name": "GPT-3.5 Turbo (OpenAI API)",
-    #     "type": "api"
-    # }
-]
-
 class Settings(BaseSettings):
     APP_NAME: str = "LLM-Forge"
-    # Add other settings like API keys from .env later if needed
-    # OPENAI_API_KEY: str | None = None
+    # Provider credentials/endpoints used by llm_service (set in .env)
+    OPENAI_API_KEY: Optional[str] = None
+    HUGGINGFACE_API_TOKEN: Optional[str] = None
+    OLLAMA_BASE_URL: Optional[str] = None
+    # Endpoint overrides, e.g. for OpenAI-compatible gateways or the benchmark stub servers
+    OPENAI_BASE_URL: Optional[str] = None # None = api.openai.com
+    HUGGINGFACE_API_URL: str = "https://api-inference.huggingface.co"
+
+    # Shared outbound HTTP client pools (one per provider)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_S: float = 30.0
+    HTTP2_ENABLED: bool = True # Used only if the optional `h2` package is installed
+    HTTP_CONNECT_TIMEOUT_S: float = 5.0
+    HUGGINGFACE_TIMEOUT_S: float = 60.0
+    OLLAMA_TIMEOUT_S: float = 120.0 # Local models can be slow to produce a full response
+    OPENAI_TIMEOUT_S: float = 60.0
+
+    # Per-provider backpressure: concurrent calls, token-bucket rate (0 = unlimited)
+    # and how many callers may wait before new ones get 429
+    PROVIDER_MAX_CONCURRENCY: Dict[str, int] = {"openai": 8, "huggingface": 8, "ollama": 4}
+    PROVIDER_RATE_PER_S: Dict[str, float] = {"openai": 5.0, "huggingface": 5.0, "ollama": 0.0}
+    PROVIDER_RATE_BURST: Dict[str, float] = {"openai": 10.0, "huggingface": 10.0}
+    PROVIDER_MAX_QUEUE: int = 64
+
+    # Model registry file (JSON, or YAML with PyYAML installed); defaults to app/core/models.json.
+    # Edits are picked up without a restart, checked at most every MODELS_RELOAD_INTERVAL_S.
+    MODELS_FILE: Optional[str] = None
+    MODELS_RELOAD_INTERVAL_S: float = 2.0
+
+    # Local model cache: estimated bytes of weights kept resident before LRU eviction
+    MODEL_CACHE_MAX_BYTES: int = 4 * 1024 ** 3
+    # Model IDs that are never evicted, e.g. MODEL_CACHE_PINNED_MODELS='["distilgpt2"]'
+    MODEL_CACHE_PINNED_MODELS: List[str] = []
+
+    # Routing of evaluation calls over a model's backends (its Ollama replicas).
+    # Backends failing ROUTING_BREAKER_FAILURES times in a row are skipped for
+    # ROUTING_BREAKER_COOLDOWN_S; failed calls are retried with jittered exponential
+    # backoff. Hedging sends a second request to another replica when the first
+    # hasn't answered after ROUTING_HEDGE_AFTER_S (0 = off; per-model
+    # "hedge_after_s" in the registry overrides it).
+    OLLAMA_BASE_URLS: List[str] = [] # Replicas; OLLAMA_BASE_URL is used when empty
+    ROUTING_POLICY: str = "least_latency" # "least_latency" or "round_robin" over replicas
+    ROUTING_MAX_RETRIES: int = 2
+    ROUTING_BACKOFF_BASE_S: float = 0.25
+    ROUTING_BACKOFF_MAX_S: float = 4.0
+    ROUTING_HEDGE_AFTER_S: float = 0.0
+    ROUTING_BREAKER_FAILURES: int = 5
+    ROUTING_BREAKER_COOLDOWN_S: float = 30.0
+
+    # Startup warm-up: local models loaded, pinned and run once on WARMUP_PROMPT
+    # when the app starts; /api/ready answers 503 until this has finished
+    WARMUP_MODELS: List[str] = []
+    WARMUP_PROMPT: str = "Hello"
+    WARMUP_TORCH_COMPILE: bool = False # torch.compile warm-up models (in-process pipelines only)
+    WARMUP_BLOCKING: bool = False # Finish warm-up before accepting requests instead of in the background
+
+    # Per-model admission control for chat and evaluation requests: concurrent
+    # requests per model (override with "max_concurrency"/"max_queue" in the model
+    # registry), a bounded priority queue, and default deadlines per priority class
+    # (0 = none). Shed requests get 503 with Retry-After.
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENCY: int = 8 # Keep >= BATCH_MAX_SIZE so local batches can fill
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_TIMEOUT_S: Dict[str, float] = {"interactive": 30.0, "batch": 0.0}
+
+    # Micro-batching of local pipeline calls (per model)
+    BATCH_ENABLED: bool = True
+    BATCH_MAX_SIZE: int = 8         # dispatch once this many requests are queued...
+    BATCH_MAX_WAIT_MS: float = 10.0 # ...or the oldest request has waited this long
+    BATCH_MAX_QUEUE: int = 256      # requests beyond this are rejected with 503
+
+    # Multi-process local inference: N worker processes per model that memory-map
+    # one shared copy of the weights (exported once to WORKER_WEIGHTS_DIR).
+    # Streaming still runs in the API process.
+    WORKER_POOL_ENABLED: bool = False
+    WORKER_POOL_SIZE: int = 2
+    WORKER_TORCH_THREADS: int = 0 # Threads per worker; 0 = CPU count / WORKER_POOL_SIZE
+    WORKER_WEIGHTS_DIR: str = "data/shared_weights"
+
+    # Multi-turn chat sessions: KV caches of causal models are kept between turns
+    SESSION_KV_CACHE_MAX_BYTES: int = 1024 ** 3 # LRU sessions drop their KV cache beyond this
+    SESSION_MAX_COUNT: int = 1000
+    SESSION_IDLE_TTL_S: float = 1800.0 # Sessions idle longer than this are forgotten (0 = never)
+
+    # Cache of generated text for deterministic requests (greedy decoding / temperature 0)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_BACKEND: str = "memory" # "memory" or "sqlite"
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10_000
+    RESPONSE_CACHE_TTL_S: float = 24 * 3600.0 # 0 = entries never expire
+    RESPONSE_CACHE_SQLITE_PATH: str = "data/response_cache.sqlite3"
 
-    # Allow models to be configured via environment variable later if needed
-    # Example: MODELS_JSON: str = json.dumps(AVAILABLE_MODELS)
+    # Batch evaluation jobs: manifest + JSONL results per job, and concurrent
+    # calls per provider for each job (on top of the provider limits above)
+    EVAL_JOBS_DIR: str = "data/eval_jobs"
+    EVAL_JOB_PROVIDER_CONCURRENCY: Dict[str, int] = {"openai": 4, "huggingface": 4, "ollama": 2}
+    EVAL_JOB_OVERLOAD_RETRIES: int = 5 # Retries (after Retry-After) of pairs shed with 503
 
     class Config:
         env_file = ".env"
 
 settings = Settings()
 
-# Simple function to get model details by ID
+# Model details by ID (dict lookup in the hot-reloadable model registry)
 def get_model_config(model_id: str):
-    for model in AVAILABLE_MODELS:
-        if model["id"] == model_id:
-            return model
-    return None
\ No newline at end of file
+    from .registry import get_registry # The registry reads its path from settings
+    return get_registry().get(model_id)
@@ -0,0 +1,139 @@
+# backend/app/core/registry.py
+import importlib.util
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Shipped default; override with MODELS_FILE (JSON, or YAML if PyYAML is installed)
+DEFAULT_MODELS_FILE = os.path.join(os.path.dirname(__file__), "models.json")
+
+# "transformers" models run in-process through chat_service; "provider" models
+# are served by llm_service (openai/, huggingface/, local/ prefixes)
+RUNTIMES = ("transformers", "provider")
+_PROVIDER_PREFIXES = ("openai/", "huggingface/", "local/")
+
+
+def _read_file(path: str) -> Any:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if importlib.util.find_spec("yaml") is None:
+                raise RuntimeError(f"Cannot read {path}: PyYAML is not installed")
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _normalize(entry: Dict[str, Any]) -> Dict[str, Any]:
+    if "id" not in entry:
+        raise ValueError(f"Model entry without an id: {entry}")
+    entry = dict(entry)
+    entry.setdefault("name", entry["id"])
+    entry.setdefault("runtime", "provider" if entry["id"].startswith(_PROVIDER_PREFIXES) else "transformers")
+    if entry["runtime"] not in RUNTIMES:
+        raise ValueError(f"Model {entry['id']}: unknown runtime '{entry['runtime']}'")
+    if entry.get("draft_model") and entry["runtime"] != "transformers":
+        raise ValueError(f"Model {entry['id']}: draft_model needs the transformers runtime")
+    entry.setdefault("deployed", False)
+    return entry
+
+
+class ModelRegistry:
+    """Model configurations indexed by ID, loaded from a JSON/YAML file.
+
+    The file is re-read when its modification time changes (checked at most
+    every ``reload_interval_s`` on lookup) or on an explicit reload(). A file
+    that fails to parse leaves the previous configuration in place.
+    Deployment flags set at runtime survive reloads.
+    """
+
+    def __init__(self, path: str, reload_interval_s: float = 2.0):
+        self.path = path
+        self.reload_interval_s = reload_interval_s
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._deployed_overrides: Dict[str, bool] = {}
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self.reload()
+
+    def reload(self) -> int:
+        """Re-reads the registry file. Returns the number of models loaded."""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.path)
+                data = _read_file(self.path)
+                entries = data.get("models", []) if isinstance(data, dict) else data
+                models = {}
+                for raw in entries:
+                    entry = _normalize(raw)
+                    models[entry["id"]] = entry
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error("Failed to load model registry %s: %s", self.path, e)
+                if not self._models:
+                    raise
+                return len(self._models)
+            # Swap the whole index at once so readers never see a partial registry
+            self._models = models
+            self._mtime = mtime
+            self.reloads += 1
+            self.last_error = None
+            logger.info("Loaded %d models from %s", len(models), self.path)
+            return len(models)
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval_s
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def get(self, model_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a model's configuration, or None if it isn't registered."""
+        self._maybe_reload()
+        return self._models.get(model_id)
+
+    def all(self, runtime: Optional[str] = None) -> List[Dict[str, Any]]:
+        self._maybe_reload()
+        return [m for m in self._models.values() if runtime is None or m["runtime"] == runtime]
+
+    def is_deployed(self, model_id: str) -> bool:
+        entry = self.get(model_id)
+        if entry is None:
+            return False
+        return self._deployed_overrides.get(model_id, entry["deployed"])
+
+    def set_deployed(self, model_id: str, deployed: bool) -> None:
+        self._deployed_overrides[model_id] = deployed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "models": len(self._models),
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
+
+
+_registry: Optional[ModelRegistry] = None
+
+
+def get_registry() -> ModelRegistry:
+    """Returns the process-wide registry, loading it on first use."""
+    global _registry
+    if _registry is None:
+        from .config import settings
+        _registry = ModelRegistry(settings.MODELS_FILE or DEFAULT_MODELS_FILE, settings.MODELS_RELOAD_INTERVAL_S)
+    return _registry
@@ -1,14 +1,31 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 from .api import models as models_router # Rename to avoid conflict
 from .api import chat as chat_router     # Rename to avoid conflict
+from .api import evaluate as evaluate_router
+from .services import chat_service, eval_jobs, http_clients, metrics, rate_limit, response_cache, routing, warmup
 
 
 load_dotenv() # Load .env file if present
 
-app = FastAPI(title="LLM-Forge Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """ Creates shared resources on startup and releases them on shutdown """
+    await http_clients.startup()
+    await warmup.startup()
+    yield
+    await warmup.shutdown()
+    await eval_jobs.shutdown() # Running jobs can be resumed from their results files
+    await chat_service.shutdown_batchers()
+    await http_clients.shutdown()
+    chat_service.shutdown_worker_pools()
+    response_cache.shutdown()
+
+app = FastAPI(title="LLM-Forge Backend", lifespan=lifespan)
 
 # Configure CORS (Cross-Origin Resource Sharing)
 # Allows the frontend (running on a different port/domain) to talk to the backend
@@ -37,9 +54,48 @@ async def get_status():
     """ Simple status endpoint for frontend to check connectivity """
     return {"status": "Backend is running!"}
 
+@app.get("/api/ready")
+async def get_readiness():
+    """ Readiness probe: 503 until the startup warm-up of WARMUP_MODELS has finished """
+    return JSONResponse(warmup.get_status(), status_code=200 if warmup.is_ready() else 503)
+
+@app.get("/api/status/http-pools")
+async def get_http_pool_status():
+    """ Connection-pool usage of the shared provider HTTP clients """
+    return http_clients.get_pool_stats()
+
+@app.get("/api/status/providers")
+async def get_provider_limits():
+    """ Active/waiting/rejected counts of the per-provider rate limiters """
+    return rate_limit.get_limiter_stats()
+
+@app.get("/api/status/backends")
+async def get_backend_status():
+    """ Routing policy, hedge counts and per-backend circuit state/latency """
+    return routing.get_routing_stats()
+
+@app.get("/api/status/response-cache")
+async def get_response_cache_stats():
+    """ Hit ratio, size and evictions of the deterministic response cache """
+    return response_cache.get_response_cache_stats()
+
+@app.delete("/api/status/response-cache")
+async def clear_response_cache():
+    """ Drops every cached response """
+    cache = response_cache.get_response_cache()
+    if cache is not None:
+        cache.clear()
+    return response_cache.get_response_cache_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """ Prometheus text-format metrics: per-stage latency, throughput, in-flight requests, caches """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Include the new API routers
 app.include_router(models_router.router, prefix="/api/models", tags=["Models"])
 app.include_router(chat_router.router, prefix="/api/chat", tags=["Chat"])
+app.include_router(evaluate_router.router, prefix="/api/evaluate", tags=["Evaluate"])
 
 
 print("Backend started successfully with Chat and Models endpoints.")
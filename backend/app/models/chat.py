@@ -1,22 +1,22 @@
 # backend/app/models/chat.py
-from pydantic import BaseModel
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
+
+from .model import ModelInfo # Re-exported; shared with the model registry API
 
 class ChatRequest(BaseModel):
     model_id: str
     message: str
-    # Add history later if needed: history: list[dict[str, str]] = []
+    use_cache: bool = Field(True, description="Set to false to bypass the response cache for this request")
+    session_id: Optional[str] = Field(
+        None, max_length=128, description="Continue (or start) a multi-turn conversation with this client-chosen ID"
+    )
+    priority: Literal["interactive", "batch"] = Field("interactive", description="Admission priority class")
+    timeout_s: Optional[float] = Field(
+        None, gt=0, description="Drop the request if generation hasn't started within this many seconds (default per priority)"
+    )
 
 class ChatResponse(BaseModel):
     response: str
     model_id: str
-
-class ModelInfo(BaseModel):
-    id: str = Field(..., description="Unique identifier for the model")
-    name: str = Field(..., description="User-friendly name for the model")
-    source: Optional[str] = Field(None, description="Origin of the model (e.g., OpenAI, Hugging Face, Local)")
-    deployed: bool = Field(..., description="Indicates if the model is actively deployed/available")
-
-    class Config:
-        orm_mode = True # If you load this from a DB model later
\ No newline at end of file
+    session_id: Optional[str] = None
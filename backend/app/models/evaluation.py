@@ -0,0 +1,44 @@
+# backend/app/models/evaluation.py
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Union
+
+class EvaluationConfig(BaseModel):
+    # Field names mirror the frontend's EvalConfig interface
+    temperature: float = Field(0.7, ge=0.0, le=2.0, description="Sampling temperature (0 = greedy)")
+    maxTokens: int = Field(512, gt=0, description="Maximum number of tokens to generate")
+
+class EvaluationRequest(BaseModel):
+    model_id: str
+    prompt: str
+    config: EvaluationConfig = EvaluationConfig()
+    use_cache: bool = Field(True, description="Set to false to bypass the response cache for this request")
+    priority: Literal["interactive", "batch"] = Field("interactive", description="Admission priority class")
+    timeout_s: Optional[float] = Field(
+        None, gt=0, description="Drop the request if the provider call hasn't started within this many seconds (default per priority)"
+    )
+
+class EvaluationResponse(BaseModel):
+    response: str
+    model_id: str
+
+class BatchPrompt(BaseModel):
+    id: str = Field(..., description="Stable identifier used to match results when a job is resumed")
+    prompt: str
+
+class BatchEvaluationRequest(BaseModel):
+    prompts: List[Union[str, BatchPrompt]] = Field(..., min_length=1, description="Plain strings get their list index as ID")
+    model_ids: List[str] = Field(..., min_length=1)
+    config: EvaluationConfig = EvaluationConfig()
+    use_cache: bool = True
+    job_id: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{1,64}$", description="Reuse an existing job ID to resume it")
+
+class BatchJobStatus(BaseModel):
+    job_id: str
+    state: str # pending / running / completed / cancelled / failed
+    total: int
+    completed: int
+    failed: int
+    skipped: int # pairs already present in the results file when the run started
+    output_path: str
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
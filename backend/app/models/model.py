@@ -1,4 +1,4 @@
-# backend/app/models/chat.py
+# backend/app/models/model.py
 from pydantic import BaseModel, Field
 from typing import Optional
 
@@ -7,6 +7,9 @@ class ModelInfo(BaseModel):
     name: str = Field(..., description="User-friendly name for the model")
     source: Optional[str] = Field(None, description="Origin of the model (e.g., OpenAI, Hugging Face, Local)")
     deployed: bool = Field(..., description="Indicates if the model is actively deployed/available")
+    runtime: Optional[str] = Field(None, description="'transformers' (loaded in this backend) or 'provider' (remote API)")
+    state: Optional[str] = Field(None, description="Runtime state of local models: not_loaded, loading, loaded, evicted or failed")
+    memory_bytes: Optional[int] = Field(None, description="Estimated memory used by the loaded model")
 
     class Config:
-        orm_mode = True # If you load this from a DB model later
\ No newline at end of file
+        orm_mode = True # If you load this from a DB model later
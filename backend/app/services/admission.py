@@ -0,0 +1,289 @@
+# backend/app/services/admission.py
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..core.config import get_model_config, settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most urgent first
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+
+class OverloadedError(RuntimeError):
+    """Raised when a request is shed: queue full, displaced, or its deadline can't be met."""
+
+    def __init__(self, message: str, retry_after_s: int):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+class _Waiter:
+    __slots__ = ("rank", "seq", "deadline", "future")
+
+    def __init__(self, rank: int, seq: int, deadline: Optional[float], future: "asyncio.Future"):
+        self.rank = rank
+        self.seq = seq
+        self.deadline = deadline
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+
+class AdmissionController:
+    """Per-model concurrency limit with a bounded priority queue and deadlines.
+
+    Up to ``max_concurrency`` requests run at once; the rest wait in priority
+    order (FIFO within a class). Requests are shed with OverloadedError instead
+    of queueing when the queue is full (a queued request of a lower class is
+    displaced first, if there is one) or when the expected wait already exceeds
+    their deadline. Waiters whose deadline passes are dropped before they start.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self._heap: List[_Waiter] = []
+        self._seq = itertools.count()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.displaced = 0
+        self.expired = 0
+        # Moving average of how long an admitted request holds its slot
+        self.service_time_s: Optional[float] = None
+
+    def configure(self, max_concurrency: int, max_queue: int) -> None:
+        """Applies new limits (e.g. after a registry reload); a higher limit admits waiters at once."""
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self._dispatch()
+
+    def estimated_wait_s(self, ahead: int) -> float:
+        """Expected queueing time with `ahead` requests in front, from the mean service time."""
+        if self.service_time_s is None:
+            return 0.0
+        return self.service_time_s * (ahead // self.max_concurrency + 1)
+
+    def _retry_after_s(self) -> int:
+        return max(1, math.ceil(self.estimated_wait_s(self.waiting)))
+
+    def _shed(self, reason: str) -> OverloadedError:
+        return OverloadedError(f"Model {self.name} is overloaded: {reason}. Retry later.", self._retry_after_s())
+
+    async def acquire(self, priority: str = INTERACTIVE, deadline: Optional[float] = None) -> None:
+        """Waits for a slot. `deadline` is a time.monotonic() value by which the work must start."""
+        rank = PRIORITIES.index(priority)
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            self.expired += 1
+            raise self._shed("request deadline already passed")
+        if self.active < self.max_concurrency and self.waiting == 0:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        ahead = sum(1 for w in self._heap if w.rank <= rank and not w.future.done())
+        if deadline is not None and self.service_time_s is not None and now + self.estimated_wait_s(ahead) > deadline:
+            self.rejected += 1
+            raise self._shed("expected wait exceeds the request deadline")
+        if self.waiting >= self.max_queue:
+            victim = max(
+                (w for w in self._heap if w.rank > rank and not w.future.done()),
+                key=lambda w: (w.rank, w.seq), default=None,
+            )
+            if victim is None:
+                self.rejected += 1
+                raise self._shed(f"{self.waiting} requests queued")
+            self.waiting -= 1
+            self.displaced += 1
+            victim.future.set_exception(self._shed(f"displaced by {priority} traffic"))
+
+        waiter = _Waiter(rank, next(self._seq), deadline, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, waiter)
+        self.waiting += 1
+        timeout = None if deadline is None else max(0.0, deadline - now)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if not waiter.future.done():
+                # Still queued: leave the queue (the heap entry is skipped on dispatch)
+                waiter.future.cancel()
+                self.waiting -= 1
+                if isinstance(e, asyncio.TimeoutError):
+                    self.expired += 1
+                    raise self._shed("request deadline passed while queued") from None
+                raise
+            if waiter.future.exception() is not None:
+                raise waiter.future.exception() from None
+            # Granted just as we gave up: hand the slot on
+            self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                self.expired += 1
+                raise self._shed("request deadline passed while queued") from None
+            raise
+
+    def release(self, service_time_s: Optional[float] = None) -> None:
+        self.active -= 1
+        if service_time_s is not None:
+            self.service_time_s = (
+                service_time_s if self.service_time_s is None else 0.8 * self.service_time_s + 0.2 * service_time_s
+            )
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self._heap and self.active < self.max_concurrency:
+            waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                continue # Timed out, cancelled or displaced
+            self.waiting -= 1
+            if waiter.deadline is not None and now >= waiter.deadline:
+                self.expired += 1
+                waiter.future.set_exception(self._shed("request deadline passed while queued"))
+                continue
+            self.active += 1
+            self.admitted += 1
+            waiter.future.set_result(None)
+
+    def queued_by_priority(self) -> Dict[str, int]:
+        counts = {p: 0 for p in PRIORITIES}
+        for w in self._heap:
+            if not w.future.done():
+                counts[PRIORITIES[w.rank]] += 1
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued_by_priority(),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "displaced": self.displaced,
+            "expired": self.expired,
+            "service_time_s": round(self.service_time_s, 3) if self.service_time_s is not None else None,
+        }
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def _limits(model_id: str) -> Tuple[int, int]:
+    # Per-model "max_concurrency" / "max_queue" in the model registry override the defaults
+    model_config = get_model_config(model_id) or {}
+    return (
+        model_config.get("max_concurrency", settings.ADMISSION_MAX_CONCURRENCY),
+        model_config.get("max_queue", settings.ADMISSION_MAX_QUEUE),
+    )
+
+
+def get_controller(model_id: str) -> AdmissionController:
+    """Returns the model's controller, created on first use and kept in sync with the registry."""
+    max_concurrency, max_queue = _limits(model_id)
+    controller = _controllers.get(model_id)
+    if controller is None:
+        controller = AdmissionController(model_id, max_concurrency, max_queue)
+        _controllers[model_id] = controller
+    elif (controller.max_concurrency, controller.max_queue) != (max(1, max_concurrency), max(0, max_queue)):
+        controller.configure(max_concurrency, max_queue)
+    return controller
+
+
+def deadline_for(priority: str, timeout_s: Optional[float] = None) -> Optional[float]:
+    """Absolute deadline for a request arriving now: its own timeout or the class default (0 = none)."""
+    if timeout_s is None:
+        timeout_s = settings.ADMISSION_TIMEOUT_S.get(priority, 0.0)
+    return time.monotonic() + timeout_s if timeout_s and timeout_s > 0 else None
+
+
+class Slot:
+    """A held admission slot that outlives a single block, e.g. across a streaming response."""
+
+    def __init__(self, controller: Optional[AdmissionController]):
+        self._controller = controller
+        self._start = time.perf_counter()
+        self.released = controller is None
+
+    def release(self) -> None:
+        """Gives the slot back; safe to call more than once."""
+        if not self.released:
+            self.released = True
+            self._controller.release(time.perf_counter() - self._start)
+
+    def holding(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Wraps a stream so the slot is released once it is exhausted, fails or is closed."""
+        return _HeldStream(chunks, self)
+
+
+class _HeldStream:
+    # A plain async generator can't do this: one closed before its first item never runs its finally
+    def __init__(self, chunks: AsyncIterator[str], slot: Slot):
+        self._chunks = chunks
+        self._slot = slot
+
+    def __aiter__(self) -> "_HeldStream":
+        return self
+
+    async def __anext__(self) -> str:
+        try:
+            return await self._chunks.__anext__()
+        except BaseException: # Including StopAsyncIteration
+            self._slot.release()
+            raise
+
+    async def aclose(self) -> None:
+        try:
+            await self._chunks.aclose()
+        finally:
+            self._slot.release()
+
+
+async def acquire_slot(model_id: str, priority: str = INTERACTIVE, deadline: Optional[float] = None) -> Slot:
+    """Waits for one of the model's slots; the caller must release() it (no-op if ADMISSION_ENABLED is off)."""
+    if not settings.ADMISSION_ENABLED:
+        return Slot(None)
+    controller = get_controller(model_id)
+    await controller.acquire(priority, deadline)
+    return Slot(controller)
+
+
+@asynccontextmanager
+async def admit(model_id: str, priority: str = INTERACTIVE, deadline: Optional[float] = None) -> AsyncIterator[None]:
+    """Holds one of the model's slots for the duration of the block (no-op if ADMISSION_ENABLED is off)."""
+    slot = await acquire_slot(model_id, priority, deadline)
+    try:
+        yield
+    finally:
+        slot.release()
+
+
+def get_admission_stats() -> Dict[str, Any]:
+    return {model_id: c.stats() for model_id, c in _controllers.items()}
+
+
+def _collect_metrics():
+    """Exposes admission queues and shed counts to /metrics."""
+    controllers = list(_controllers.items())
+    yield ("llmforge_admission_queued", "Requests waiting for an admission slot.", "gauge",
+           [({"model": m, "priority": p}, n) for m, c in controllers for p, n in c.queued_by_priority().items()])
+    yield ("llmforge_admission_active", "Requests holding an admission slot.", "gauge",
+           [({"model": m}, c.active) for m, c in controllers])
+    yield ("llmforge_admission_shed_total", "Requests shed by admission control, by reason.", "counter",
+           [({"model": m, "reason": reason}, getattr(c, reason)) for m, c in controllers
+            for reason in ("rejected", "displaced", "expired")])
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,157 @@
+# backend/app/services/batching.py
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Runs one batched call: (prompts, kwargs) -> one result per prompt, same order
+BatchRunner = Callable[[List[str], Dict[str, Any]], Awaitable[List[Any]]]
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a model's batching queue is at capacity."""
+
+
+class _Pending:
+    __slots__ = ("prompt", "kwargs", "kwargs_key", "future", "enqueued_at")
+
+    def __init__(self, prompt: str, kwargs: Dict[str, Any], future: "asyncio.Future"):
+        self.prompt = prompt
+        self.kwargs = kwargs
+        # Only requests with identical generation kwargs can share a pipeline call
+        self.kwargs_key = json.dumps(kwargs, sort_keys=True, default=str)
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """Collects requests for one model into micro-batches.
+
+    A batch is dispatched once it holds ``max_batch_size`` requests or the
+    first request in it has waited ``max_wait_ms``. Batches for a model run one
+    at a time; requests arriving during a run queue up and form the next batch.
+    Within a batch, prompts are grouped by generation kwargs and sorted by
+    length so that padding inside each pipeline call is minimal.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        runner: BatchRunner,
+        max_batch_size: int,
+        max_wait_ms: float,
+        max_queue: int,
+        length_fn: Callable[[str], int] = len,
+    ):
+        self.name = name
+        self._runner = runner
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self.max_queue = max_queue
+        self._length_fn = length_fn
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._in_hand: List[_Pending] = [] # Taken off the queue by the worker, not yet answered
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, prompt: str, **kwargs: Any) -> Any:
+        """Queues a prompt and waits for its share of a batched result."""
+        if self._closed:
+            raise QueueFullError(f"Batch queue for {self.name} is shut down.")
+        self._ensure_worker()
+        if self._queue.qsize() >= self.max_queue:
+            raise QueueFullError(f"Batch queue for {self.name} is full ({self.max_queue} pending).")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Pending(prompt, kwargs, future))
+        return await future
+
+    def _ensure_worker(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run(), name=f"batcher:{self.name}")
+
+    async def _collect(self) -> List[_Pending]:
+        batch = self._in_hand = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while not self._closed:
+            batch = await self._collect()
+            # Requests whose callers went away are dropped before doing any work
+            batch = [p for p in batch if not p.future.done()]
+            if not batch:
+                continue
+
+            groups: Dict[str, List[_Pending]] = {}
+            for pending in batch:
+                groups.setdefault(pending.kwargs_key, []).append(pending)
+
+            for group in groups.values():
+                group.sort(key=lambda p: self._length_fn(p.prompt))
+                await self._dispatch(group)
+
+    async def _dispatch(self, group: List[_Pending]) -> None:
+        self.batches += 1
+        self.items += len(group)
+        logger.debug("Dispatching batch of %d for %s", len(group), self.name)
+        now = time.perf_counter()
+        for pending in group:
+            metrics.observe_stage(self.name, "queue_wait", now - pending.enqueued_at)
+        try:
+            results = await self._runner([p.prompt for p in group], group[0].kwargs)
+            if len(results) != len(group):
+                raise RuntimeError(f"Batch runner returned {len(results)} results for {len(group)} prompts")
+        except Exception as e:
+            for pending in group:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        for pending, result in zip(group, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    async def close(self) -> None:
+        """Stops the worker and fails every queued or running request with QueueFullError."""
+        self._closed = True
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            # wait_for() in _collect can swallow a cancellation that races with a queue item
+            while not worker.done():
+                worker.cancel()
+                await asyncio.wait([worker], timeout=0.1)
+        pending = list(self._in_hand)
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for item in pending:
+            if not item.future.done():
+                item.future.set_exception(QueueFullError(f"Batch queue for {self.name} is shut down."))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": (self.items / self.batches) if self.batches else 0.0,
+        }
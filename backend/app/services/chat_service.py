@@ -1,53 +1,478 @@
 # backend/app/services/chat_service.py
 import logging
-from transformers import pipeline, AutoModelForSeq2SeqLM, AutoTokenizer, AutoModelForCausalLM
-from ..core.config import get_model_config
+from ..core.config import get_model_config, settings
+from ..core.registry import get_registry
+from .model_cache import ModelCache, estimate_pipeline_bytes
+from .batching import BatchScheduler, QueueFullError
+from .response_cache import get_response_cache, make_key
+from .worker_pool import InferenceWorkerPool, configure_tokenizer
+from .precision import apply_precision, get_precision, load_kwargs, variant_key
+from .chat_sessions import ChatSession, SessionStore, crop_kv_cache, kv_cache_length
+from . import admission, metrics, speculative
 import asyncio
+import contextlib
+import time
+import threading
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-# Simple cache for loaded models/pipelines to avoid reloading on every request
-# Warning: This is a basic in-memory cache. For production, consider LRU cache
-# or more sophisticated model serving solutions (like BentoML, Ray Serve).
-# Also, this can consume significant memory if many models are loaded.
-_loaded_pipelines = {}
+# transformers (and with it torch) is imported inside the functions that load
+# or run models, so processes that never touch a local model start fast.
+
+def _local_model_config(model_id: str):
+    """Registry entry of a model served in-process by transformers, or None."""
+    model_config = get_model_config(model_id)
+    if model_config and model_config.get("runtime") == "transformers":
+        return model_config
+    return None
+
+def _cache_key(model_id: str) -> str:
+    """Model cache key: the model ID plus the precision it is configured to load in."""
+    return variant_key(model_id, get_precision(_local_model_config(model_id)))
+
+# Cache for loaded models/pipelines to avoid reloading on every request.
+# Bounded by an estimated byte budget; least-recently-used pipelines are
+# evicted first and pinned models are kept resident.
+_model_cache = ModelCache(
+    max_bytes=settings.MODEL_CACHE_MAX_BYTES,
+    pinned=[_cache_key(m) for m in settings.MODEL_CACHE_PINNED_MODELS],
+)
+
+# In-flight loads keyed by model ID (single-flight) and the last known load state
+_inflight_loads: Dict[str, "asyncio.Future"] = {}
+_load_status: Dict[str, dict] = {}
+
+# Per-model micro-batching schedulers, created on first use
+_batchers: Dict[str, BatchScheduler] = {}
+
+# Multi-turn chat sessions and their KV caches
+_sessions = SessionStore(
+    max_kv_bytes=settings.SESSION_KV_CACHE_MAX_BYTES,
+    max_sessions=settings.SESSION_MAX_COUNT,
+    idle_ttl_s=settings.SESSION_IDLE_TTL_S,
+)
+
+# Per-model inference worker pools (WORKER_POOL_ENABLED), started on first use
+_worker_pools: Dict[str, InferenceWorkerPool] = {}
+_inflight_pool_starts: Dict[str, "asyncio.Future"] = {}
+
+# (model config, generation config) per model, read from the small config files so
+# response-cache lookups don't need the weights loaded
+_generation_settings: Dict[str, tuple] = {}
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_pipeline(model_id: str):
-    """Loads or retrieves a cached Hugging Face pipeline."""
-    if model_id in _loaded_pipelines:
-        logger.info(f"Using cached pipeline for {model_id}")
-        return _loaded_pipelines[model_id]
+def _count_new_tokens(model_outputs) -> int:
+    """Counts the tokens produced by one pipeline forward call (padding included)."""
+    if "generated_sequence" in model_outputs:
+        # text-generation returns prompt + continuation for every row
+        sequence = model_outputs["generated_sequence"]
+        input_ids = model_outputs.get("input_ids")
+        prompt_len = input_ids.shape[-1] if input_ids is not None else 0
+        rows = sequence.numel() // max(1, sequence.shape[-1])
+        return rows * max(0, sequence.shape[-1] - prompt_len)
+    output_ids = model_outputs.get("output_ids")
+    return output_ids.numel() if output_ids is not None else 0
 
-    model_config = get_model_config(model_id)
-    if not model_config:
-        raise ValueError(f"Configuration for model {model_id} not found.")
+def _instrument_pipeline(pipe, model_id: str) -> None:
+    """Times the pipeline's preprocess/_forward/postprocess steps.
+
+    The pipeline looks these up on the instance for both single and batched
+    calls, so wrapping them once at load time covers every generation.
+    """
+    def timed(stage: str, fn, count_tokens: bool = False):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            metrics.observe_stage(model_id, stage, elapsed)
+            if count_tokens:
+                try:
+                    metrics.observe_tokens(model_id, _count_new_tokens(result), elapsed)
+                except Exception: # Unknown output layout; the timing is still recorded
+                    pass
+            return result
+        return wrapper
+
+    pipe.preprocess = timed("tokenization", pipe.preprocess)
+    pipe._forward = timed("generation", pipe._forward, count_tokens=True)
+    pipe.postprocess = timed("postprocess", pipe.postprocess)
+
+def _task_for(model_id: str):
+    """Returns (pipeline task, model class) for a model."""
+    from transformers import AutoModelForCausalLM, AutoModelForSeq2SeqLM
 
     # Basic check for model type based on name (can be improved)
-    task = "text2text-generation" # Default for T5 style
-    model_class = AutoModelForSeq2SeqLM
     if "gpt" in model_id.lower() or "causal" in model_id.lower():
-         task = "text-generation"
-         model_class = AutoModelForCausalLM
+         return "text-generation", AutoModelForCausalLM
+    return "text2text-generation", AutoModelForSeq2SeqLM # Default for T5 style
+
+def _load_pipeline(model_id: str):
+    """Loads a Hugging Face pipeline from scratch and stores it in the model cache."""
+    from transformers import AutoTokenizer, pipeline
+
+    model_config = _local_model_config(model_id)
+    if not model_config:
+        raise ValueError(f"Configuration for model {model_id} not found.")
+
+    task, model_class = _task_for(model_id)
+    precision = get_precision(model_config)
 
     try:
-        logger.info(f"Loading model {model_id} for task {task}...")
+        logger.info("Loading model %s for task %s (%s)...", model_id, task, precision)
+        start = time.perf_counter()
         # Specify device_map="auto" or device=0 for GPU if available and configured
         # For CPU explicitly: device=-1 (default usually)
-        model = model_class.from_pretrained(model_id)
+        model = model_class.from_pretrained(model_id, **load_kwargs(precision))
+        model = apply_precision(model, precision)
         tokenizer = AutoTokenizer.from_pretrained(model_id)
+        configure_tokenizer(tokenizer, task)
         pipe = pipeline(task, model=model, tokenizer=tokenizer) # Add device=0 for GPU
-        _loaded_pipelines[model_id] = pipe
-        logger.info(f"Pipeline for {model_id} loaded successfully.")
+        _instrument_pipeline(pipe, model_id)
+        size_bytes = estimate_pipeline_bytes(pipe)
+        draft_id = model_config.get("draft_model")
+        if draft_id:
+            # The draft lives on the pipeline: one cache entry, loaded and evicted together
+            draft = _load_draft_model(draft_id, precision)
+            speculative.enable(pipe, draft, model_id, _count_new_tokens, model_config.get("num_assistant_tokens", 0))
+            size_bytes += estimate_pipeline_bytes(draft)
+            logger.info("Assisted decoding for %s uses draft model %s", model_id, draft_id)
+        load_time = time.perf_counter() - start
+        metrics.observe_stage(model_id, "model_load", load_time)
+        _model_cache.put(variant_key(model_id, precision), pipe, size_bytes=size_bytes, load_time_s=load_time)
+        logger.info("Pipeline for %s loaded successfully in %.1fs.", model_id, load_time)
         return pipe
     except Exception as e:
         logger.error(f"Error loading model {model_id}: {e}", exc_info=True)
         raise RuntimeError(f"Failed to load model {model_id}") from e
 
-async def generate_response(model_id: str, prompt: str) -> str:
-    """Generates a response using the specified model."""
-    logger.info(f"Generating response for model {model_id}")
-    model_config = get_model_config(model_id)
+def _load_draft_model(draft_id: str, target_precision: str):
+    """Loads a draft model, in its own registry precision if it is registered, else the target's."""
+    from transformers import AutoModelForCausalLM
+
+    draft_config = _local_model_config(draft_id)
+    precision = get_precision(draft_config) if draft_config else target_precision
+    draft = AutoModelForCausalLM.from_pretrained(draft_id, **load_kwargs(precision))
+    draft = apply_precision(draft, precision)
+    draft.eval()
+    return draft
+
+def get_pipeline(model_id: str):
+    """Loads or retrieves a cached Hugging Face pipeline (blocking)."""
+    pipe = _model_cache.get(_cache_key(model_id))
+    if pipe is not None:
+        logger.debug("Using cached pipeline for %s", model_id)
+        return pipe
+    return _load_pipeline(model_id)
+
+async def _load_and_track(model_id: str):
+    status = _load_status[model_id]
+    try:
+        pipe = await asyncio.to_thread(_load_pipeline, model_id)
+    except Exception as e:
+        status.update(state="failed", error=str(e), finished_at=time.time())
+        raise
+    status.update(state="loaded", error=None, finished_at=time.time())
+    return pipe
+
+async def get_pipeline_async(model_id: str):
+    """Loads or retrieves a cached pipeline without blocking the event loop.
+
+    Concurrent callers asking for the same cold model share a single load:
+    the first caller starts it in a worker thread and everyone awaits the same
+    task, receiving the same pipeline or the same exception.
+    """
+    pipe = _model_cache.get(_cache_key(model_id))
+    if pipe is not None:
+        return pipe
+
+    task = _inflight_loads.get(model_id)
+    if task is None:
+        _load_status[model_id] = {
+            "state": "loading",
+            "started_at": time.time(),
+            "finished_at": None,
+            "error": None,
+            "waiters": 0,
+        }
+        task = asyncio.ensure_future(_load_and_track(model_id))
+        _inflight_loads[model_id] = task
+        task.add_done_callback(lambda _: _inflight_loads.pop(model_id, None))
+
+    status = _load_status[model_id]
+    status["waiters"] += 1
+    try:
+        # Shield so a cancelled request doesn't abort the load other requests wait on
+        return await asyncio.shield(task)
+    finally:
+        status["waiters"] -= 1
+
+def _start_worker_pool(model_id: str) -> InferenceWorkerPool:
+    """Starts the worker processes for a model (blocking)."""
+    model_config = _local_model_config(model_id)
+    if not model_config:
+        raise ValueError(f"Configuration for model {model_id} not found.")
+    if model_config.get("draft_model"):
+        logger.warning("Worker pools don't support assisted decoding; %s runs without its draft model", model_id)
+    task, model_class = _task_for(model_id)
+    pool = InferenceWorkerPool(
+        model_id=model_id,
+        task=task,
+        model_class_name=model_class.__name__,
+        precision=get_precision(_local_model_config(model_id)),
+        num_workers=settings.WORKER_POOL_SIZE,
+        torch_threads=settings.WORKER_TORCH_THREADS,
+        weights_dir=settings.WORKER_WEIGHTS_DIR,
+    )
+    start = time.perf_counter()
+    try:
+        pool.start()
+    except Exception as e:
+        pool.shutdown()
+        logger.error(f"Error starting inference workers for {model_id}: {e}", exc_info=True)
+        raise RuntimeError(f"Failed to load model {model_id}") from e
+    metrics.observe_stage(model_id, "model_load", time.perf_counter() - start)
+    _worker_pools[model_id] = pool
+    return pool
+
+async def get_worker_pool_async(model_id: str) -> InferenceWorkerPool:
+    """Returns the model's worker pool, starting it once for all concurrent callers."""
+    pool = _worker_pools.get(model_id)
+    if pool is not None:
+        return pool
+    task = _inflight_pool_starts.get(model_id)
+    if task is None:
+        task = asyncio.ensure_future(asyncio.to_thread(_start_worker_pool, model_id))
+        _inflight_pool_starts[model_id] = task
+        task.add_done_callback(lambda _: _inflight_pool_starts.pop(model_id, None))
+    return await asyncio.shield(task)
+
+def get_worker_pool_stats() -> dict:
+    """Returns per-worker outstanding requests and restart counts for each pool."""
+    return {model_id: pool.stats() for model_id, pool in _worker_pools.items()}
+
+def shutdown_worker_pools() -> None:
+    """Stops every worker process. Called from the FastAPI lifespan."""
+    for pool in _worker_pools.values():
+        pool.shutdown()
+    _worker_pools.clear()
+
+def get_load_status() -> dict:
+    """Returns the load state of every model that has been requested since startup."""
+    now = time.time()
+    view = {}
+    for model_id, status in _load_status.items():
+        entry = dict(status)
+        end = status["finished_at"] or now
+        entry["elapsed_s"] = round(end - status["started_at"], 3)
+        entry["cached"] = _cache_key(model_id) in _model_cache
+        view[model_id] = entry
+    return view
+
+def get_model_runtime_state(model_id: str) -> dict:
+    """Returns the runtime state of a local model and the memory it holds.
+
+    States: "loaded", "loading", "failed", "evicted" (loaded earlier, since
+    pushed out of the model cache) or "not_loaded".
+    """
+    if model_id in _worker_pools:
+        return {"state": "loaded", "memory_bytes": None}
+    size = _model_cache.size_of(_cache_key(model_id))
+    if size is not None:
+        return {"state": "loaded", "memory_bytes": size}
+    if model_id in _inflight_loads or model_id in _inflight_pool_starts:
+        return {"state": "loading", "memory_bytes": None}
+    status = _load_status.get(model_id)
+    if status is None:
+        return {"state": "not_loaded", "memory_bytes": None}
+    return {"state": "evicted" if status["state"] == "loaded" else status["state"], "memory_bytes": None}
+
+# Background preloads started by deploy_model, keyed by model ID
+_deploy_tasks: Dict[str, "asyncio.Task"] = {}
+
+async def _preload(model_id: str) -> None:
+    try:
+        if settings.WORKER_POOL_ENABLED:
+            await get_worker_pool_async(model_id)
+        else:
+            await get_pipeline_async(model_id)
+    except Exception as e:
+        logger.error("Background preload of %s failed: %s", model_id, e)
+
+def deploy_model(model_id: str) -> None:
+    """Pins a local model and starts loading it in the background."""
+    if not _local_model_config(model_id):
+        raise ValueError(f"Model {model_id} is not a local model.")
+    _model_cache.pin(_cache_key(model_id))
+    task = _deploy_tasks.get(model_id)
+    if task is None or task.done():
+        task = asyncio.ensure_future(_preload(model_id))
+        _deploy_tasks[model_id] = task
+        task.add_done_callback(lambda _: _deploy_tasks.pop(model_id, None))
+
+def undeploy_model(model_id: str) -> None:
+    """Unpins a local model and releases its pipeline or worker processes."""
+    if not _local_model_config(model_id):
+        raise ValueError(f"Model {model_id} is not a local model.")
+    key = _cache_key(model_id)
+    _model_cache.unpin(key)
+    task = _deploy_tasks.pop(model_id, None)
+    if task is not None:
+        task.cancel() # The shielded load itself finishes; it just isn't pinned
+    if _model_cache.evict(key):
+        logger.info("Unloaded model %s", model_id)
+    pool = _worker_pools.pop(model_id, None)
+    if pool is not None:
+        pool.shutdown()
+
+def _compile_forward(pipe) -> None:
+    """Swaps the model's forward for a torch.compile'd one; compilation happens on the next call."""
+    import torch
+
+    pipe.model._eager_forward = pipe.model.forward
+    pipe.model.forward = torch.compile(pipe.model.forward, dynamic=True)
+
+async def warm_up_model(model_id: str, prompt: str, compile: bool = False) -> dict:
+    """Loads and pins a local model, then runs one generation so the first request is fast.
+
+    With compile=True (in-process pipelines only) the forward pass is
+    torch.compile'd and the dummy generation pays the compilation; if that
+    fails the model falls back to eager mode. Returns load/generation timings.
+    """
+    model_config = _local_model_config(model_id)
+    if not model_config:
+        raise ValueError(f"Model {model_id} is not a local model.")
+    _model_cache.pin(_cache_key(model_id))
+    pipeline_kwargs = model_config.get("pipeline_kwargs", {})
+    timings = {"compiled": False}
+
+    start = time.perf_counter()
+    if settings.WORKER_POOL_ENABLED:
+        pool = await get_worker_pool_async(model_id)
+        timings["load_s"] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        await pool.run([prompt], pipeline_kwargs)
+    else:
+        pipe = await get_pipeline_async(model_id)
+        timings["load_s"] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        if compile:
+            _compile_forward(pipe)
+        try:
+            await asyncio.to_thread(pipe, prompt, **pipeline_kwargs)
+            timings["compiled"] = compile
+        except Exception as e:
+            if not compile:
+                raise
+            logger.warning("torch.compile failed for %s, using eager mode: %s", model_id, e)
+            pipe.model.forward = pipe.model._eager_forward
+            await asyncio.to_thread(pipe, prompt, **pipeline_kwargs)
+    timings["generate_s"] = round(time.perf_counter() - start, 3)
+    return timings
+
+def _extract_response_text(task: str, model_id: str, prompt: str, results) -> str:
+    """Extracts the generated text for one prompt based on the pipeline's task."""
+    response_text = ""
+    if isinstance(results, list) and results:
+        if task == "text-generation":
+             # Typically [{'generated_text': '...'}]
+             # Remove the input prompt if the model includes it in the output
+             full_text = results[0].get('generated_text', '')
+             # Check if prompt is at the beginning and remove it
+             if full_text.startswith(prompt):
+                 response_text = full_text[len(prompt):].strip()
+             else:
+                  response_text = full_text.strip() # Otherwise take the whole generated text
+        elif task == "text2text-generation":
+             # Typically [{'generated_text': '...'}]
+             response_text = results[0].get('generated_text', '').strip()
+        else:
+             logger.warning(f"Pipeline for {model_id} has unknown task type '{task}'. Attempting default extraction.")
+             # Fallback attempt for common output format
+             response_text = results[0].get('generated_text', '').strip()
+    return response_text
+
+async def _run_batch(model_id: str, prompts: List[str], pipeline_kwargs: dict) -> list:
+    """Runs one batched pipeline call off the event loop, one result list per prompt."""
+    if settings.WORKER_POOL_ENABLED:
+        pool = await get_worker_pool_async(model_id)
+        outputs = await pool.run(prompts, pipeline_kwargs)
+    else:
+        pipe = await get_pipeline_async(model_id)
+        outputs = await asyncio.to_thread(pipe, prompts, batch_size=len(prompts), **pipeline_kwargs)
+    # text-generation yields a list per prompt, text2text-generation a bare dict
+    return [out if isinstance(out, list) else [out] for out in outputs]
+
+def _get_batcher(model_id: str) -> BatchScheduler:
+    batcher = _batchers.get(model_id)
+    if batcher is None:
+        batcher = BatchScheduler(
+            name=model_id,
+            runner=lambda prompts, kwargs: _run_batch(model_id, prompts, kwargs),
+            # Assisted decoding runs one sequence at a time
+            max_batch_size=1 if (_local_model_config(model_id) or {}).get("draft_model") else settings.BATCH_MAX_SIZE,
+            max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+            max_queue=settings.BATCH_MAX_QUEUE,
+        )
+        _batchers[model_id] = batcher
+    return batcher
+
+async def shutdown_batchers() -> None:
+    """Stops every model's batching worker; called from the FastAPI lifespan."""
+    for batcher in list(_batchers.values()):
+        await batcher.close()
+    _batchers.clear()
+
+def get_batching_stats() -> dict:
+    """Returns queue depth and batch-size counters per model."""
+    return {model_id: b.stats() for model_id, b in _batchers.items()}
+
+def _load_generation_settings(model_id: str) -> tuple:
+    """Reads a model's config and generation config without loading its weights (blocking)."""
+    from transformers import AutoConfig, GenerationConfig
+
+    hf_config = AutoConfig.from_pretrained(model_id)
+    try:
+        generation_config = GenerationConfig.from_pretrained(model_id)
+    except OSError:
+        generation_config = GenerationConfig.from_model_config(hf_config) # No generation_config.json
+    return hf_config, generation_config
+
+async def _get_generation_settings(model_id: str) -> tuple:
+    cached = _generation_settings.get(model_id)
+    if cached is None:
+        cached = await asyncio.to_thread(_load_generation_settings, model_id)
+        _generation_settings[model_id] = cached
+    return cached
+
+def _is_deterministic(task: str, model_config, generation_config, pipeline_kwargs: dict) -> bool:
+    """True if the pipeline decodes greedily/with beam search for these kwargs.
+
+    The pipeline merges the model's task_specific_params (GPT-2 turns sampling
+    on there) under the call kwargs, over the model's generation_config.
+    """
+    task_params = (getattr(model_config, "task_specific_params", None) or {}).get(task, {})
+    effective = {**task_params, **pipeline_kwargs}
+    if "do_sample" in effective:
+        return not effective["do_sample"]
+    return not getattr(generation_config, "do_sample", False)
+
+async def generate_response(
+    model_id: str,
+    prompt: str,
+    use_cache: bool = True,
+    priority: str = admission.INTERACTIVE,
+    deadline: Optional[float] = None,
+) -> str:
+    """Generates a response using the specified model.
+
+    Deterministic generations are served from the response cache unless
+    use_cache is False. Generation itself waits for an admission slot of the
+    model (raising OverloadedError when shed); cache hits don't, and don't
+    load the model either.
+    """
+    logger.debug("Generating response for model %s", model_id)
+    model_config = _local_model_config(model_id)
     if not model_config:
          raise ValueError(f"Model {model_id} not found or configured.")
 
@@ -55,55 +480,349 @@ async def generate_response(model_id: str, prompt: str) -> str:
     # if model_config.get("type") == "api":
     #    pass
 
+    try:
+        return await _generate_response(model_id, model_config, prompt, use_cache, priority, deadline)
+    except (QueueFullError, admission.OverloadedError):
+        raise
+    except Exception:
+        return f"Error generating response: Check backend logs for details." # Don't expose raw exception message to user
+
+async def _generate_response(
+    model_id: str, model_config: dict, prompt: str, use_cache: bool, priority: str, deadline: Optional[float],
+    admitted: bool = False,
+) -> str:
+    """generate_response for a local model, raising on generation errors instead of returning error text.
+
+    admitted: the caller already holds the model's admission slot.
+    """
     # --- Local Hugging Face Model ---
+    metrics.IN_FLIGHT.inc(model_id)
     try:
-        # Get the pipeline (which knows its task internally)
-        pipe = get_pipeline(model_id)
+        task, _ = _task_for(model_id) # The task the pipeline / workers are built for
         pipeline_kwargs = model_config.get("pipeline_kwargs", {})
 
-        logger.info(f"Running pipeline (task: {pipe.task}) for {model_id} with prompt: '{prompt[:50]}...'")
-
-        # Use asyncio.to_thread to run the potentially blocking pipeline call
-        # in a separate thread, preventing it from blocking the FastAPI event loop.
-        results = await asyncio.to_thread(pipe, prompt, **pipeline_kwargs)
-
-        # Extract text based on the pipeline's task attribute
-        response_text = ""
-        if isinstance(results, list) and results:
-            # Access the task type directly from the pipeline object
-            if pipe.task == "text-generation":
-                 # Typically [{'generated_text': '...'}]
-                 # Remove the input prompt if the model includes it in the output
-                 full_text = results[0].get('generated_text', '')
-                 # Check if prompt is at the beginning and remove it
-                 if full_text.startswith(prompt):
-                     response_text = full_text[len(prompt):].strip()
-                 else:
-                      response_text = full_text.strip() # Otherwise take the whole generated text
-            elif pipe.task == "text2text-generation":
-                 # Typically [{'generated_text': '...'}]
-                 response_text = results[0].get('generated_text', '').strip()
+        # Looked up before the model is loaded: a hit for an evicted model costs no load
+        cache = get_response_cache()
+        cache_key = None
+        if cache is not None:
+            deterministic = False
+            if use_cache:
+                hf_config, generation_config = await _get_generation_settings(model_id)
+                deterministic = _is_deterministic(task, hf_config, generation_config, pipeline_kwargs)
+            if deterministic:
+                cache_key = make_key("chat", _cache_key(model_id), prompt, pipeline_kwargs)
+                cached = await cache.aget("chat", cache_key)
+                if cached is not None:
+                    logger.debug("Serving cached response for model %s", model_id)
+                    metrics.REQUESTS.inc(model_id, "cached")
+                    return cached
+            else:
+                cache.record_bypass("chat")
+
+        logger.debug("Running pipeline (task: %s) for %s with prompt: '%.50s...'", task, model_id, prompt)
+
+        # Cold models load inside the admission slot, so shed requests never trigger a load
+        slot = contextlib.nullcontext() if admitted else admission.admit(model_id, priority, deadline)
+        async with slot:
+            if settings.BATCH_ENABLED:
+                results = await _get_batcher(model_id).submit(prompt, **pipeline_kwargs)
+            elif settings.WORKER_POOL_ENABLED:
+                results = (await _run_batch(model_id, [prompt], pipeline_kwargs))[0]
             else:
-                 logger.warning(f"Pipeline for {model_id} has unknown task type '{pipe.task}'. Attempting default extraction.")
-                 # Fallback attempt for common output format
-                 response_text = results[0].get('generated_text', '').strip()
+                pipe = await get_pipeline_async(model_id)
+                # Use asyncio.to_thread to run the potentially blocking pipeline call
+                # in a separate thread, preventing it from blocking the FastAPI event loop.
+                results = await asyncio.to_thread(pipe, prompt, **pipeline_kwargs)
 
+        response_text = _extract_response_text(task, model_id, prompt, results)
 
         if not response_text:
-             logger.warning(f"Pipeline for {model_id} returned empty or unexpected result structure: {results}")
+             logger.warning("Pipeline for %s returned empty or unexpected result structure: %s", model_id, results)
+             metrics.REQUESTS.inc(model_id, "empty")
              return "Model returned no response or failed to parse."
 
-        logger.info(f"Model {model_id} generated response: '{response_text[:50]}...'")
+        logger.debug("Model %s generated response: '%.50s...'", model_id, response_text)
+        metrics.REQUESTS.inc(model_id, "ok")
+        if cache_key is not None:
+            await cache.aset(cache_key, response_text)
         return response_text
 
+    except (QueueFullError, admission.OverloadedError):
+        metrics.REQUESTS.inc(model_id, "rejected")
+        raise
     except Exception as e:
+        metrics.REQUESTS.inc(model_id, "error")
         logger.error(f"Error during generation with {model_id}: {e}", exc_info=True)
         # Attempt to clear the pipeline from cache if it caused an error during generation
-        if model_id in _loaded_pipelines:
+        try:
+            # Try to delete gracefully, handle potential issues during cleanup
+            if _model_cache.evict(_cache_key(model_id)):
+                logger.info("Removed potentially problematic pipeline %s from cache.", model_id)
+        except Exception as cleanup_err:
+             logger.error(f"Error removing pipeline {model_id} from cache: {cleanup_err}")
+        raise
+    finally:
+        metrics.IN_FLIGHT.dec(model_id)
+
+async def stream_response(
+    model_id: str, prompt: str, priority: str = admission.INTERACTIVE, deadline: Optional[float] = None
+) -> AsyncIterator[str]:
+    """
+    Returns a stream of generated text chunks for a local model.
+    The model's admission slot is taken before this returns, so a shed request
+    raises OverloadedError before any response has started; the slot is held
+    until the stream ends or is closed.
+    """
+    model_config = _local_model_config(model_id)
+    if not model_config:
+         raise ValueError(f"Model {model_id} not found or configured.")
+    slot = await admission.acquire_slot(model_id, priority, deadline)
+    return slot.holding(_stream_tokens(model_id, prompt, model_config))
+
+async def _stream_tokens(model_id: str, prompt: str, model_config: dict) -> AsyncIterator[str]:
+    """
+    Yields text chunks as they are produced. Generation runs in a worker
+    thread; closing the generator (client went away) sets a cancel event
+    that stops generate() at the next token.
+    """
+    from transformers import StoppingCriteriaList, TextIteratorStreamer
+    from .stopping_criteria import CancelCriteria
+
+    pipe = await get_pipeline_async(model_id)
+    generate_kwargs = dict(model_config.get("pipeline_kwargs", {}))
+    with metrics.STAGE_SECONDS.time(model_id, "tokenization"):
+        inputs = pipe.tokenizer(prompt, return_tensors="pt")
+    streamer = TextIteratorStreamer(pipe.tokenizer, skip_prompt=True, skip_special_tokens=True)
+    cancel_event = threading.Event()
+
+    def _generate():
+        start = time.perf_counter()
+        try:
+            output_ids = pipe.model.generate(
+                **inputs,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([CancelCriteria(cancel_event)]),
+                pad_token_id=pipe.tokenizer.pad_token_id,
+                assistant_model=getattr(pipe, "draft_model", None),
+                **generate_kwargs,
+            )
+        except Exception:
+            streamer.end() # Unblock the consumer; the error is re-raised below
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.observe_stage(model_id, "generation", elapsed)
+        new_tokens = output_ids.shape[-1] - (0 if pipe.model.config.is_encoder_decoder else inputs["input_ids"].shape[-1])
+        metrics.observe_tokens(model_id, new_tokens, elapsed)
+
+    generation = asyncio.ensure_future(asyncio.to_thread(_generate))
+    metrics.IN_FLIGHT.inc(model_id)
+    try:
+        while True:
+            chunk = await asyncio.to_thread(next, streamer, None)
+            if chunk is None:
+                break
+            if chunk:
+                yield chunk
+        await generation
+    finally:
+        metrics.IN_FLIGHT.dec(model_id)
+        cancel_event.set()
+        if not generation.done():
+            # Let the thread observe the cancel event and wind down
+            await asyncio.wait([generation])
+        if generation.done() and not generation.cancelled() and generation.exception():
+            logger.error("Streaming generation failed for %s: %s", model_id, generation.exception())
+
+# --- Multi-turn sessions ---
+# Transcripts are rendered as "User: ...\nAssistant: ..." lines and the model
+# continues after a trailing "Assistant:".
+
+_ROLE_PREFIX = {"user": "User:", "assistant": "Assistant:"}
+_TURN_SEPARATOR = "\nUser:"
+
+def _context_window(pipe) -> int:
+    """Maximum number of positions the model accepts."""
+    for attr in ("n_positions", "max_position_embeddings"):
+        value = getattr(pipe.model.config, attr, None)
+        if value:
+            return value
+    return min(pipe.tokenizer.model_max_length, 2048) # model_max_length is a huge sentinel when unset
+
+def _history_text(tokenizer, messages: List[Tuple[str, str]], budget: int) -> str:
+    """Renders the most recent messages that fit in `budget` tokens, ending with "Assistant:".
+
+    Older messages are dropped whole; the newest user message is always kept,
+    left-truncated if it alone exceeds the budget.
+    """
+    suffix = "\n" + _ROLE_PREFIX["assistant"]
+    budget -= len(tokenizer(suffix, add_special_tokens=False)["input_ids"])
+    lines = [f"{_ROLE_PREFIX[role]} {text}" for role, text in messages]
+    kept: List[str] = []
+    used = 0
+    for line in reversed(lines):
+        n_tokens = len(tokenizer("\n" + line, add_special_tokens=False)["input_ids"])
+        if used + n_tokens > budget:
+            break
+        kept.append(line)
+        used += n_tokens
+    if not kept:
+        ids = tokenizer(lines[-1], add_special_tokens=False)["input_ids"]
+        kept.append(tokenizer.decode(ids[-max(1, budget):]))
+    return "\n".join(reversed(kept)) + suffix
+
+def _causal_session_turn(pipe, session: ChatSession, messages: List[Tuple[str, str]], generate_kwargs: dict) -> str:
+    """Runs one turn of a causal-model session, reusing the session's KV cache (blocking).
+
+    `messages` is the transcript including the new user message, which is
+    only added to the session once the turn has succeeded.
+
+    Sessions decode without the draft model: the KV cache carried between
+    turns belongs to the target only.
+    """
+    import torch
+    from transformers import StoppingCriteriaList
+    from .stopping_criteria import StopOnText
+
+    tokenizer, model = pipe.tokenizer, pipe.model
+    max_new_tokens = generate_kwargs.get("max_new_tokens", 50)
+    budget = _context_window(pipe) - max_new_tokens
+    new_ids = tokenizer(f"{_TURN_SEPARATOR} {messages[-1][1]}\n{_ROLE_PREFIX['assistant']}", add_special_tokens=False)["input_ids"]
+
+    if session.past_key_values is not None and len(session.token_ids) + len(new_ids) <= budget:
+        # Only the new turn's tokens are run through the model
+        input_ids = session.token_ids + new_ids
+        past_key_values = session.past_key_values
+    else:
+        # First turn, evicted cache, or the transcript outgrew the context window:
+        # re-encode the most recent messages that fit (cached positions would shift)
+        input_ids = tokenizer(_history_text(tokenizer, messages, budget), add_special_tokens=False)["input_ids"]
+        input_ids = input_ids[-budget:]
+        past_key_values = None
+    cached = kv_cache_length(past_key_values)
+    session.reused_tokens += cached
+    session.encoded_tokens += len(input_ids) - cached
+
+    start = time.perf_counter()
+    output = model.generate(
+        input_ids=torch.tensor([input_ids]),
+        attention_mask=torch.ones(1, len(input_ids), dtype=torch.long),
+        past_key_values=past_key_values,
+        use_cache=True,
+        return_dict_in_generate=True,
+        stopping_criteria=StoppingCriteriaList([StopOnText(tokenizer, _TURN_SEPARATOR, len(input_ids))]),
+        pad_token_id=tokenizer.pad_token_id,
+        **generate_kwargs,
+    )
+    reply_ids = output.sequences[0, len(input_ids):].tolist()
+    elapsed = time.perf_counter() - start
+    metrics.observe_stage(session.model_id, "generation", elapsed)
+    metrics.observe_tokens(session.model_id, len(reply_ids), elapsed)
+
+    reply = tokenizer.decode(reply_ids, skip_special_tokens=True)
+    cut = reply.find(_TURN_SEPARATOR)
+    if cut >= 0:
+        # Keep only the tokens of the reply itself so the cache matches the transcript
+        reply = reply[:cut]
+        reply_ids = reply_ids[:len(tokenizer(reply, add_special_tokens=False)["input_ids"])]
+    token_ids = input_ids + reply_ids
+    session.set_kv(token_ids, crop_kv_cache(output.past_key_values, len(token_ids)))
+    return reply.strip()
+
+async def generate_session_response(
+    model_id: str,
+    session_id: str,
+    message: str,
+    use_cache: bool = True,
+    priority: str = admission.INTERACTIVE,
+    deadline: Optional[float] = None,
+) -> str:
+    """Generates the next reply in a multi-turn session.
+
+    Causal models keep the session's past_key_values between turns, so a turn
+    only encodes its own tokens; the transcript is re-encoded (truncated to the
+    context window) only when that cache was evicted or would overflow.
+    Seq2seq models re-encode the truncated transcript every turn. Sessions
+    always run in the API process, like streaming.
+    """
+    model_config = _local_model_config(model_id)
+    if not model_config:
+         raise ValueError(f"Model {model_id} not found or configured.")
+
+    session = _sessions.get_or_create(session_id, model_id)
+    async with session.lock:
+        # The turn is added to the transcript only once it has succeeded
+        messages = session.messages + [("user", message)]
+        pipeline_kwargs = dict(model_config.get("pipeline_kwargs", {}))
+        task, _ = _task_for(model_id)
+        # Cold models load inside the admission slot, so shed turns never trigger a load
+        if task == "text-generation":
+            metrics.IN_FLIGHT.inc(model_id)
+            try:
+                async with admission.admit(model_id, priority, deadline):
+                    pipe = await get_pipeline_async(model_id)
+                    reply = await asyncio.to_thread(_causal_session_turn, pipe, session, messages, pipeline_kwargs)
+                metrics.REQUESTS.inc(model_id, "ok")
+            except admission.OverloadedError:
+                metrics.REQUESTS.inc(model_id, "rejected")
+                raise
+            except Exception as e:
+                metrics.REQUESTS.inc(model_id, "error")
+                logger.error(f"Error during session generation with {model_id}: {e}", exc_info=True)
+                session.drop_kv()
+                raise RuntimeError("Error generating response: Check backend logs for details.") from e
+            finally:
+                metrics.IN_FLIGHT.dec(model_id)
+        else:
             try:
-                # Try to delete gracefully, handle potential issues during cleanup
-                del _loaded_pipelines[model_id]
-                logger.info(f"Removed potentially problematic pipeline {model_id} from cache.")
-            except Exception as cleanup_err:
-                 logger.error(f"Error removing pipeline {model_id} from cache: {cleanup_err}")
-        return f"Error generating response: Check backend logs for details." # Don't expose raw exception message to user
\ No newline at end of file
+                async with admission.admit(model_id, priority, deadline):
+                    pipe = await get_pipeline_async(model_id)
+                    budget = _context_window(pipe) - 1 # Room for the EOS token the tokenizer appends
+                    prompt = _history_text(pipe.tokenizer, messages, budget)
+                    reply = await _generate_response(
+                        model_id, model_config, prompt, use_cache, priority, deadline, admitted=True
+                    )
+            except admission.OverloadedError:
+                metrics.REQUESTS.inc(model_id, "rejected")
+                raise
+            except QueueFullError:
+                raise
+            except Exception as e:
+                raise RuntimeError("Error generating response: Check backend logs for details.") from e
+        session.messages.extend([("user", message), ("assistant", reply)])
+        session.turns += 1
+    _sessions.touch(session)
+    return reply
+
+def delete_session(session_id: str) -> bool:
+    """Forgets a session's transcript and KV cache."""
+    return _sessions.delete(session_id)
+
+def get_session_stats() -> dict:
+    """Returns session count, KV-cache memory and token reuse counters."""
+    return _sessions.stats()
+
+def get_speculative_stats() -> dict:
+    """Returns draft acceptance rate and tokens per target pass for models with a draft model."""
+    return {
+        m["id"]: {"draft_model": m["draft_model"], **speculative.stats(m["id"])}
+        for m in get_registry().all("transformers")
+        if m.get("draft_model")
+    }
+
+def get_cache_stats() -> dict:
+    """Returns hit/miss/eviction/load-time counters for the local model cache."""
+    return _model_cache.stats()
+
+
+def _collect_metrics():
+    """Exposes model cache and batching queue state to /metrics."""
+    cache_stats = _model_cache.stats()
+    yield ("llmforge_model_cache_used_bytes", "Estimated bytes of resident local models.", "gauge",
+           [({}, cache_stats["used_bytes"])])
+    for field in ("hits", "misses", "evictions", "loads"):
+        yield (f"llmforge_model_cache_{field}_total", f"Local model cache {field}.", "counter",
+               [({}, cache_stats[field])])
+    yield ("llmforge_batch_queue_depth", "Requests waiting in each model's batching queue.", "gauge",
+           [({"model": model_id}, b.queue_depth) for model_id, b in _batchers.items()])
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,168 @@
+# backend/app/services/chat_sessions.py
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def kv_cache_bytes(past_key_values: Any) -> int:
+    """Bytes held by a past_key_values structure (legacy tuples or a Cache object)."""
+    if past_key_values is None:
+        return 0
+    if hasattr(past_key_values, "to_legacy_cache"):
+        past_key_values = past_key_values.to_legacy_cache()
+    total = 0
+    for layer in past_key_values:
+        for tensor in layer:
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def kv_cache_length(past_key_values: Any) -> int:
+    """Number of positions covered by a past_key_values structure."""
+    if past_key_values is None:
+        return 0
+    if hasattr(past_key_values, "get_seq_length"):
+        return past_key_values.get_seq_length()
+    return past_key_values[0][0].shape[-2]
+
+
+def crop_kv_cache(past_key_values: Any, length: int) -> Any:
+    """Drops cached positions beyond `length`."""
+    if past_key_values is None or kv_cache_length(past_key_values) <= length:
+        return past_key_values
+    if hasattr(past_key_values, "crop"):
+        past_key_values.crop(length)
+        return past_key_values
+    return tuple(tuple(t[..., :length, :] for t in layer) for layer in past_key_values)
+
+
+class ChatSession:
+    """One conversation: its transcript and, for causal models, the KV cache of that transcript.
+
+    ``token_ids`` is the exact token sequence the model has seen so far and
+    ``past_key_values`` caches every position of it except (at most) the last,
+    so the next turn only has to run the new tokens through the model.
+    """
+
+    def __init__(self, session_id: str, model_id: str):
+        self.session_id = session_id
+        self.model_id = model_id
+        self.messages: List[Tuple[str, str]] = [] # (role, text)
+        self.token_ids: List[int] = []
+        self.past_key_values: Any = None
+        self.kv_bytes = 0
+        self.last_used = time.monotonic()
+        self.turns = 0
+        self.reused_tokens = 0 # prompt tokens served from the KV cache
+        self.encoded_tokens = 0 # prompt tokens that had to be run through the model
+        # Turns of one session run one at a time; they extend the same cache
+        self.lock = asyncio.Lock()
+
+    def drop_kv(self) -> None:
+        """Forgets the KV cache; the next turn re-encodes the transcript."""
+        self.token_ids = []
+        self.past_key_values = None
+        self.kv_bytes = 0
+
+    def set_kv(self, token_ids: List[int], past_key_values: Any) -> None:
+        self.token_ids = token_ids
+        self.past_key_values = past_key_values
+        self.kv_bytes = kv_cache_bytes(past_key_values)
+
+
+class SessionStore:
+    """Sessions in LRU order, bounded by KV-cache bytes, session count and idle time.
+
+    Going over ``max_kv_bytes`` drops the KV caches of the least recently used
+    sessions (their transcripts are kept and re-encoded on their next turn).
+    Sessions idle longer than ``idle_ttl_s`` or beyond ``max_sessions`` are
+    removed entirely. Sessions with a turn in progress are never touched.
+    """
+
+    def __init__(self, max_kv_bytes: int, max_sessions: int, idle_ttl_s: float):
+        self.max_kv_bytes = max_kv_bytes
+        self.max_sessions = max(1, max_sessions)
+        self.idle_ttl_s = idle_ttl_s
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.kv_evictions = 0
+        self.session_evictions = 0
+
+    def get_or_create(self, session_id: str, model_id: str) -> ChatSession:
+        with self._lock:
+            self._expire_idle()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = ChatSession(session_id, model_id)
+                self._sessions[session_id] = session
+            elif session.model_id != model_id:
+                # Same conversation, different model: the cache belongs to the old model
+                session.model_id = model_id
+                session.drop_kv()
+            self._sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            self._enforce_limits()
+            return session
+
+    def touch(self, session: ChatSession) -> None:
+        """Records a finished turn and re-applies the memory cap with the session's new cache."""
+        with self._lock:
+            session.last_used = time.monotonic()
+            if session.session_id in self._sessions:
+                self._sessions.move_to_end(session.session_id)
+            self._enforce_limits(keep=session.session_id)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    @property
+    def kv_bytes(self) -> int:
+        return sum(s.kv_bytes for s in self._sessions.values())
+
+    def _expire_idle(self) -> None:
+        if self.idle_ttl_s <= 0:
+            return
+        cutoff = time.monotonic() - self.idle_ttl_s
+        for session_id, session in list(self._sessions.items()):
+            if session.last_used >= cutoff:
+                break # LRU order: everything after this is newer
+            if not session.lock.locked():
+                del self._sessions[session_id]
+                self.session_evictions += 1
+
+    def _enforce_limits(self, keep: Optional[str] = None) -> None:
+        for session_id, session in list(self._sessions.items()): # oldest first
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if session_id != keep and not session.lock.locked():
+                del self._sessions[session_id]
+                self.session_evictions += 1
+        used = self.kv_bytes
+        for session_id, session in self._sessions.items():
+            if used <= self.max_kv_bytes:
+                break
+            if session_id == keep or session.kv_bytes == 0 or session.lock.locked():
+                continue
+            logger.info("Dropping KV cache of idle chat session %s (LRU)", session_id)
+            used -= session.kv_bytes
+            session.drop_kv()
+            self.kv_evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "kv_bytes": self.kv_bytes,
+                "max_kv_bytes": self.max_kv_bytes,
+                "kv_evictions": self.kv_evictions,
+                "session_evictions": self.session_evictions,
+                "reused_tokens": sum(s.reused_tokens for s in self._sessions.values()),
+                "encoded_tokens": sum(s.encoded_tokens for s in self._sessions.values()),
+            }
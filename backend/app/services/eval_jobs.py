@@ -0,0 +1,270 @@
+# backend/app/services/eval_jobs.py
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+
+from ..core.config import settings
+from ..models.evaluation import BatchEvaluationRequest, BatchJobStatus, BatchPrompt
+from . import admission, llm_service
+
+logger = logging.getLogger(__name__)
+
+# Jobs started since process start, keyed by job ID
+_jobs: Dict[str, "EvalJob"] = {}
+
+
+def _job_paths(job_id: str) -> Tuple[str, str]:
+    """Returns (manifest, results) paths for a job."""
+    base = os.path.join(settings.EVAL_JOBS_DIR, job_id)
+    return base + ".json", base + ".jsonl"
+
+
+def _normalize_prompts(prompts: List[Any]) -> List[BatchPrompt]:
+    normalized = []
+    seen = set()
+    for index, item in enumerate(prompts):
+        prompt = item if isinstance(item, BatchPrompt) else BatchPrompt(id=str(index), prompt=item)
+        if prompt.id in seen:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Duplicate prompt ID: {prompt.id}")
+        seen.add(prompt.id)
+        normalized.append(prompt)
+    return normalized
+
+
+def _read_completed(results_path: str) -> List[dict]:
+    """Reads successful results from a previous run; failed pairs are retried."""
+    results = []
+    if not os.path.exists(results_path):
+        return results
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue # Truncated last line from an interrupted run
+            if record.get("error") is None:
+                results.append(record)
+    return results
+
+
+class EvalJob:
+    """Evaluates every (prompt, model) pair of a request, appending results to a JSONL file.
+
+    Pairs are grouped by provider and drained by a fixed number of workers per
+    provider, so one slow provider neither blocks the others nor floods its own
+    rate limiter. Pairs that already succeeded in the results file are skipped,
+    which makes re-running a job with the same ID resume where it stopped.
+    """
+
+    def __init__(self, job_id: str, request: BatchEvaluationRequest):
+        self.job_id = job_id
+        self.request = request
+        self.prompts = _normalize_prompts(request.prompts)
+        self.manifest_path, self.output_path = _job_paths(job_id)
+        self.state = "pending"
+        self.results: List[dict] = _read_completed(self.output_path)
+        self.skipped = len(self.results)
+        self.completed = 0
+        self.failed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def total(self) -> int:
+        return len(self.prompts) * len(self.request.model_ids)
+
+    def status(self) -> BatchJobStatus:
+        return BatchJobStatus(
+            job_id=self.job_id,
+            state=self.state,
+            total=self.total,
+            completed=self.completed,
+            failed=self.failed,
+            skipped=self.skipped,
+            output_path=self.output_path,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+        )
+
+    def start(self) -> None:
+        os.makedirs(settings.EVAL_JOBS_DIR, exist_ok=True)
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            f.write(self.request.model_dump_json(exclude={"job_id"}))
+        self._task = asyncio.ensure_future(self._run())
+
+    def cancel(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            if self.state == "pending": # Never got to run, so _run() won't record it
+                self.state = "cancelled"
+                self.finished_at = time.time()
+                self._publish(None)
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("completed", "cancelled", "failed")
+
+    def _pending_pairs(self) -> Dict[str, List[Tuple[BatchPrompt, str]]]:
+        finished = {(r["prompt_id"], r["model_id"]) for r in self.results}
+        by_provider: Dict[str, List[Tuple[BatchPrompt, str]]] = {}
+        # Model-major order so each provider sees its own models' requests back to back
+        for model_id in self.request.model_ids:
+            provider = llm_service._provider_for(model_id) or "unknown"
+            for prompt in self.prompts:
+                if (prompt.id, model_id) not in finished:
+                    by_provider.setdefault(provider, []).append((prompt, model_id))
+        return by_provider
+
+    async def _run(self) -> None:
+        self.state = "running"
+        self.started_at = time.time()
+        try:
+            with open(self.output_path, "a", encoding="utf-8") as out:
+                workers = []
+                for provider, pairs in self._pending_pairs().items():
+                    queue: asyncio.Queue = asyncio.Queue()
+                    for pair in pairs:
+                        queue.put_nowait(pair)
+                    concurrency = settings.EVAL_JOB_PROVIDER_CONCURRENCY.get(provider, 1)
+                    workers.extend(
+                        asyncio.ensure_future(self._worker(queue, out))
+                        for _ in range(min(max(1, concurrency), len(pairs)))
+                    )
+                try:
+                    await asyncio.gather(*workers)
+                except BaseException:
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+                    raise
+            self.state = "completed"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+        except Exception as e:
+            logger.error("Evaluation job %s failed: %s", self.job_id, e, exc_info=True)
+            self.state = "failed"
+        finally:
+            self.finished_at = time.time()
+            self._publish(None)
+            logger.info(
+                "Evaluation job %s %s: %d completed, %d failed, %d skipped",
+                self.job_id, self.state, self.completed, self.failed, self.skipped,
+            )
+
+    async def _worker(self, queue: asyncio.Queue, out) -> None:
+        while not queue.empty():
+            prompt, model_id = queue.get_nowait()
+            record = await self._evaluate_one(prompt, model_id)
+            # One line per result, flushed immediately so a crash loses at most the in-flight pairs
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            if record["error"] is None:
+                self.completed += 1
+                self.results.append(record)
+            else:
+                self.failed += 1
+            self._publish(record)
+
+    async def _evaluate_one(self, prompt: BatchPrompt, model_id: str) -> dict:
+        start = time.perf_counter()
+        record = {"prompt_id": prompt.id, "model_id": model_id, "response": None, "error": None, "status_code": 200}
+        try:
+            for attempt in range(settings.EVAL_JOB_OVERLOAD_RETRIES + 1):
+                try:
+                    record["response"] = await llm_service.evaluate_model(
+                        model_id,
+                        prompt.prompt,
+                        self.request.config,
+                        use_cache=self.request.use_cache,
+                        priority=admission.BATCH, # Yields to interactive traffic on the same model
+                        deadline=admission.deadline_for(admission.BATCH),
+                    )
+                    break
+                except llm_service.OverloadedHTTPException as he:
+                    # Shed by admission control: wait as told and try again. Other 503s
+                    # (provider not configured, every circuit open) fail straight away.
+                    if attempt == settings.EVAL_JOB_OVERLOAD_RETRIES:
+                        raise
+                    await asyncio.sleep(float((he.headers or {}).get("Retry-After", 1)))
+        except HTTPException as he:
+            record.update(error=str(he.detail), status_code=he.status_code)
+        except Exception as e:
+            logger.warning("Evaluation job %s: %s failed on prompt %s: %s", self.job_id, model_id, prompt.id, e)
+            record.update(error=str(e), status_code=500)
+        record["latency_s"] = round(time.perf_counter() - start, 3)
+        record["completed_at"] = time.time()
+        return record
+
+    def _publish(self, record: Optional[dict]) -> None:
+        for queue in self._subscribers:
+            queue.put_nowait(record)
+
+    async def subscribe(self) -> AsyncIterator[dict]:
+        """Yields results already finished, then each new result until the job ends."""
+        queue: asyncio.Queue = asyncio.Queue()
+        backlog = list(self.results)
+        if not self.done:
+            self._subscribers.add(queue)
+        try:
+            for record in backlog:
+                yield record
+            if self.done:
+                return
+            while True:
+                record = await queue.get()
+                if record is None:
+                    return
+                yield record
+        finally:
+            self._subscribers.discard(queue)
+
+
+def start_job(request: BatchEvaluationRequest) -> EvalJob:
+    """Starts a job, resuming it if request.job_id refers to an earlier run."""
+    job_id = request.job_id or uuid.uuid4().hex
+    existing = _jobs.get(job_id)
+    if existing is not None and not existing.done:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job {job_id} is already running.")
+    job = EvalJob(job_id, request)
+    _jobs[job_id] = job
+    job.start()
+    return job
+
+
+def resume_job(job_id: str) -> EvalJob:
+    """Restarts a job from its saved manifest, skipping results already on disk."""
+    manifest_path, _ = _job_paths(job_id)
+    if not os.path.exists(manifest_path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found.")
+    with open(manifest_path, encoding="utf-8") as f:
+        request = BatchEvaluationRequest.model_validate_json(f.read())
+    request.job_id = job_id
+    return start_job(request)
+
+
+def get_job(job_id: str) -> EvalJob:
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found.")
+    return job
+
+
+def list_jobs() -> List[BatchJobStatus]:
+    return [job.status() for job in _jobs.values()]
+
+
+async def shutdown() -> None:
+    """Cancels running jobs; their results files stay on disk for resuming. Called from the FastAPI lifespan."""
+    running = [job._task for job in _jobs.values() if job._task is not None and not job._task.done()]
+    for job in _jobs.values():
+        job.cancel()
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
@@ -0,0 +1,143 @@
+# backend/app/services/http_clients.py
+import importlib.util
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# One pooled client per provider, shared for the lifetime of the application
+PROVIDERS = ("huggingface", "ollama", "openai")
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_transports: Dict[str, "_InstrumentedTransport"] = {}
+
+
+def _provider_timeout(provider: str) -> httpx.Timeout:
+    read = {
+        "huggingface": settings.HUGGINGFACE_TIMEOUT_S,
+        "ollama": settings.OLLAMA_TIMEOUT_S,
+        "openai": settings.OPENAI_TIMEOUT_S,
+    }[provider]
+    return httpx.Timeout(read, connect=settings.HTTP_CONNECT_TIMEOUT_S)
+
+
+def _http2_available() -> bool:
+    # httpx only speaks HTTP/2 when the optional `h2` package is installed
+    return settings.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Response body wrapper that marks the request finished once the body is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, transport: "_InstrumentedTransport"):
+        self._stream = stream
+        self._transport = transport
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._transport.in_flight -= 1
+        await self._stream.aclose()
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Counts requests and in-flight responses on top of the pooled HTTP transport."""
+
+    def __init__(self, limits: httpx.Limits, http2: bool):
+        self._inner = httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+        self.limits = limits
+        self.http2 = http2
+        self.requests_total = 0
+        self.errors_total = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            response = await self._inner.handle_async_request(request)
+        except Exception:
+            self.in_flight -= 1
+            self.errors_total += 1
+            raise
+        response.stream = _TrackedStream(response.stream, self)
+        return response
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        # httpcore exposes its connection list; httpx keeps the pool on a private attribute
+        pool = getattr(self._inner, "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+
+def _create_client(provider: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_S,
+    )
+    # Ollama is plain HTTP on the local network; HTTP/2 is only negotiated over TLS
+    transport = _InstrumentedTransport(limits, http2=_http2_available() and provider != "ollama")
+    _transports[provider] = transport
+    return httpx.AsyncClient(transport=transport, timeout=_provider_timeout(provider))
+
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """Returns the shared client for a provider, creating it if startup() hasn't run (e.g. scripts)."""
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown provider: {provider}")
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = _create_client(provider)
+        _clients[provider] = client
+    return client
+
+
+async def startup() -> None:
+    """Creates the per-provider clients. Called from the FastAPI lifespan."""
+    for provider in PROVIDERS:
+        get_client(provider)
+    logger.info("HTTP clients started for providers: %s", ", ".join(PROVIDERS))
+
+
+async def shutdown() -> None:
+    """Closes every pooled client. Called from the FastAPI lifespan."""
+    for provider, client in list(_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning("Error closing HTTP client for %s: %s", provider, e)
+    _clients.clear()
+    _transports.clear()
+
+
+def get_pool_stats(provider: Optional[str] = None) -> Dict[str, Any]:
+    """Returns connection-pool usage per provider."""
+    if provider is not None:
+        transport = _transports.get(provider)
+        return transport.stats() if transport else {}
+    return {name: t.stats() for name, t in _transports.items()}
@@ -1,27 +1,70 @@
 import httpx # Use httpx for async requests
 import openai
-import os
-from typing import Dict, Any, List
+import json
+import logging
+from typing import Dict, Any, List, AsyncIterator, Optional
 from fastapi import HTTPException, status
 
 from app.core.config import settings # Import settings
-from app.schemas.evaluation import EvaluationConfig # Import the config schema
-from app.schemas.model import ModelInfo # Import ModelInfo schema
+from app.core.registry import get_registry
+from app.models.evaluation import EvaluationConfig # Import the config schema
+from app.models.model import ModelInfo # Import ModelInfo schema
+from app.services import admission, chat_service, http_clients, rate_limit, routing
+from app.services import metrics
+from app.services.response_cache import get_response_cache, make_key
 
-# Initialize OpenAI client (consider doing this once, maybe in main.py or via dependency injection)
+logger = logging.getLogger(__name__)
+
+# Async OpenAI client, created on first use on top of the shared pooled HTTP client
 # Ensure OPENAI_API_KEY is loaded via settings
-if settings.OPENAI_API_KEY:
-    openai.api_key = settings.OPENAI_API_KEY
-else:
-    print("Warning: OPENAI_API_KEY not found in settings. OpenAI models will not work.")
+if not settings.OPENAI_API_KEY:
+    logger.warning("OPENAI_API_KEY not found in settings. OpenAI models will not work.")
+
+_async_openai_client: Optional[openai.AsyncOpenAI] = None
+
+def get_async_openai_client() -> openai.AsyncOpenAI:
+    """Returns the async OpenAI client, rebuilding it if its HTTP pool was recycled."""
+    global _async_openai_client
+    http_client = http_clients.get_client("openai")
+    if _async_openai_client is None or _async_openai_client._client is not http_client:
+        _async_openai_client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL, http_client=http_client,
+            max_retries=0, # Retries and hedging are the router's job
+        )
+    return _async_openai_client
+
+def _provider_for(model_id: str) -> Optional[str]:
+    """Maps a model ID prefix to the provider that serves it."""
+    prefix = model_id.split('/', 1)[0]
+    return {"openai": "openai", "huggingface": "huggingface", "local": "ollama"}.get(prefix)
+
+_NOT_CONFIGURED = {
+    "openai": "OpenAI API key not configured.",
+    "huggingface": "HuggingFace API token not configured.",
+    "ollama": "Ollama base URL not configured.",
+}
+
+def _require_configured(model_id: str) -> None:
+    """Raises 503 if the credentials/URL needed to reach the model's provider are missing."""
+    if not _provider_configured(model_id):
+        raise routing.NotConfiguredError(_NOT_CONFIGURED[_provider_for(model_id)])
+
+def _openai_error(e: openai.APIError) -> HTTPException:
+    """Maps an OpenAI SDK error to an HTTPException, keeping the upstream status where there is one."""
+    logger.warning("OpenAI API Error: %s", e)
+    if isinstance(e, openai.APIStatusError):
+        return HTTPException(status_code=e.status_code, detail=f"OpenAI API Error: {e}")
+    if isinstance(e, openai.APIConnectionError): # Includes timeouts
+        return HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=f"Network error contacting OpenAI: {e}")
+    return HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"OpenAI API Error: {e}")
 
 # --- Hugging Face Helper ---
 async def call_huggingface_inference_api(model_id: str, prompt: str, config: EvaluationConfig, client: httpx.AsyncClient) -> str:
     """Calls the Hugging Face Inference API asynchronously."""
     if not settings.HUGGINGFACE_API_TOKEN:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="HuggingFace API token not configured.")
+        raise routing.NotConfiguredError("HuggingFace API token not configured.")
 
-    api_url = f"https://api-inference.huggingface.co/models/{model_id}"
+    api_url = f"{settings.HUGGINGFACE_API_URL.rstrip('/')}/models/{model_id}"
     headers = {"Authorization": f"Bearer {settings.HUGGINGFACE_API_TOKEN}"}
 
     # Map config to HF API parameters
@@ -37,14 +80,14 @@ async def call_huggingface_inference_api(model_id: str, prompt: str, config: Eva
     }
 
     try:
-        response = await client.post(api_url, headers=headers, json=payload, timeout=60.0) # Add timeout
+        response = await client.post(api_url, headers=headers, json=payload) # Timeout comes from the provider client
         response.raise_for_status() # Raise HTTPStatusError for bad responses (4xx or 5xx)
 
         result = response.json()
         if isinstance(result, list) and len(result) > 0 and 'generated_text' in result[0]:
             return result[0]['generated_text']
         else:
-            print(f"Unexpected HuggingFace response format: {result}")
+            logger.warning("Unexpected HuggingFace response format: %s", result)
             raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Could not parse HuggingFace response.")
 
     except httpx.HTTPStatusError as e:
@@ -55,32 +98,92 @@ async def call_huggingface_inference_api(model_id: str, prompt: str, config: Eva
             err_detail += f" - {hf_error}"
         except Exception:
              err_detail += f" - {e.response.text}" # Fallback to raw text
-        print(f"HTTPStatusError calling HuggingFace: {err_detail}")
+        logger.warning("HTTPStatusError calling HuggingFace: %s", err_detail)
         raise HTTPException(status_code=e.response.status_code, detail=err_detail) from e
     except httpx.RequestError as e:
         # Handle network-related errors (timeout, DNS, connection refused)
-        print(f"RequestError calling HuggingFace: {e}")
+        logger.warning("RequestError calling HuggingFace: %s", e)
         raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=f"Network error contacting HuggingFace: {e}") from e
 
 
 # --- Main Evaluation Service Function ---
-async def evaluate_model(model_id: str, prompt: str, config: EvaluationConfig) -> str:
+class OverloadedHTTPException(HTTPException):
+    """503 + Retry-After for a request shed by admission control; worth retrying after the wait."""
+
+    def __init__(self, e: admission.OverloadedError):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after_s)},
+        )
+
+async def evaluate_model(
+    model_id: str,
+    prompt: str,
+    config: EvaluationConfig,
+    use_cache: bool = True,
+    priority: str = admission.INTERACTIVE,
+    deadline: Optional[float] = None,
+) -> str:
     """
     Evaluates a prompt using the specified model ID and configuration.
-    Dispatches the request to the appropriate LLM backend.
+    Dispatches the request to the appropriate LLM backend once the model's
+    admission controller lets it through (503 when shed), subject to that
+    provider's concurrency/rate limit (429 when its wait queue is full).
+    The routing service picks the backend (Ollama replica), retries failures
+    on other replicas and hedges slow calls.
+    Requests with temperature 0 are answered from the response cache when
+    possible; cache hits don't count against either limit.
     """
-    print(f"Evaluating model: {model_id} with temp: {config.temperature}, maxTokens: {config.maxTokens}") # Logging
+    logger.debug("Evaluating model: %s with temp: %s, maxTokens: %s", model_id, config.temperature, config.maxTokens)
+    cache = get_response_cache()
+    cache_key = None
+    if cache is not None:
+        if use_cache and config.temperature == 0:
+            cache_key = make_key("evaluate", model_id, prompt, config.model_dump())
+            cached = await cache.aget("evaluate", cache_key)
+            if cached is not None:
+                metrics.REQUESTS.inc(model_id, "cached")
+                return cached
+        else:
+            cache.record_bypass("evaluate")
 
+    provider = _provider_for(model_id)
+    if provider is None:
+        return await _evaluate(model_id, prompt, config) # Raises the 400 for unknown formats
+    outcome = "error"
+    metrics.IN_FLIGHT.inc(model_id)
+    try:
+        async with admission.admit(model_id, priority, deadline):
+            response_text = await routing.get_router().call(
+                model_id,
+                lambda backend: _evaluate(backend.model_id, prompt, config, backend.base_url),
+                _provider_for,
+            )
+        outcome = "ok"
+    except admission.OverloadedError as oe:
+        outcome = "rejected"
+        raise OverloadedHTTPException(oe) from oe
+    except HTTPException as he:
+        if he.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+            outcome = "rejected"
+        raise
+    finally:
+        metrics.IN_FLIGHT.dec(model_id)
+        metrics.REQUESTS.inc(model_id, outcome)
+    if cache_key is not None:
+        await cache.aset(cache_key, response_text)
+    return response_text
+
+async def _evaluate(model_id: str, prompt: str, config: EvaluationConfig, base_url: Optional[str] = None) -> str:
+    """Performs the provider call for evaluate_model (no limiting). `base_url` selects the Ollama replica."""
     if model_id.startswith('openai/'):
         if not settings.OPENAI_API_KEY:
-            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="OpenAI API key not configured.")
+            raise routing.NotConfiguredError("OpenAI API key not configured.")
         try:
             openai_model_name = model_id.split('/', 1)[1]
-            # NOTE: openai library v1+ is synchronous by default.
-            # For a truly async app, call this using asyncio.to_thread or run_in_threadpool
-            # Example: loop = asyncio.get_running_loop(); await loop.run_in_executor(None, lambda: openai.chat.completions.create(...))
-            # Or use an async OpenAI client if available. Sticking to sync for simplicity here.
-            completion = openai.chat.completions.create(
+            # Async client: the completion is awaited without blocking the event loop
+            completion = await get_async_openai_client().chat.completions.create(
                 model=openai_model_name,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=config.temperature,
@@ -90,48 +193,46 @@ async def evaluate_model(model_id: str, prompt: str, config: EvaluationConfig) -
             response_text = completion.choices[0].message.content.strip()
             return response_text
         except openai.APIError as e:
-            print(f"OpenAI API Error: {e}")
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"OpenAI API Error: {e}") from e
+            raise _openai_error(e) from e
         except Exception as e: # Catch other potential OpenAI client errors
-            print(f"Unexpected OpenAI Error: {e}")
+            logger.warning("Unexpected OpenAI Error: %s", e)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal error during OpenAI call: {e}") from e
 
     elif model_id.startswith('huggingface/'):
         hf_model_name = model_id.split('/', 1)[1]
-        async with httpx.AsyncClient() as client: # Use a client session
-             return await call_huggingface_inference_api(hf_model_name, prompt, config, client)
+        client = http_clients.get_client("huggingface") # Shared pooled client
+        return await call_huggingface_inference_api(hf_model_name, prompt, config, client)
 
     elif model_id.startswith('local/'):
         local_model_name = model_id.split('/', 1)[1]
         # --- Placeholder for Local Model Interaction (e.g., Ollama) ---
         # Replace with actual async call using httpx
-        ollama_url = settings.OLLAMA_BASE_URL # Assumes you add OLLAMA_BASE_URL to settings
+        ollama_url = base_url or next(iter(routing.ollama_urls()), None)
         if not ollama_url:
-             raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Ollama base URL not configured.")
+             raise routing.NotConfiguredError("Ollama base URL not configured.")
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{ollama_url.rstrip('/')}/api/generate",
-                    json={
-                        "model": local_model_name,
-                        "prompt": prompt,
-                        "stream": False, # Get full response at once
-                        "options": {
-                            "temperature": config.temperature,
-                            "num_predict": config.maxTokens # Ollama uses num_predict
-                            # Map other options
-                        }
-                    },
-                    timeout=120.0 # Longer timeout for local models maybe
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data.get("response", "Error: 'response' key missing from Ollama result.")
+            client = http_clients.get_client("ollama")
+            response = await client.post(
+                f"{ollama_url.rstrip('/')}/api/generate",
+                json={
+                    "model": local_model_name,
+                    "prompt": prompt,
+                    "stream": False, # Get full response at once
+                    "options": {
+                        "temperature": config.temperature,
+                        "num_predict": config.maxTokens # Ollama uses num_predict
+                        # Map other options
+                    }
+                },
+            )
+            response.raise_for_status()
+            data = response.json()
+            return data.get("response", "Error: 'response' key missing from Ollama result.")
         except httpx.HTTPStatusError as e:
-             print(f"HTTPStatusError calling Ollama: {e}")
+             logger.warning("HTTPStatusError calling Ollama: %s", e)
              raise HTTPException(status_code=e.response.status_code, detail=f"Ollama API Error ({local_model_name}): {e.response.text}") from e
         except httpx.RequestError as e:
-             print(f"RequestError calling Ollama: {e}")
+             logger.warning("RequestError calling Ollama: %s", e)
              raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=f"Network error contacting Ollama ({ollama_url}): {e}") from e
         # --- End Placeholder ---
 
@@ -142,49 +243,189 @@ async def evaluate_model(model_id: str, prompt: str, config: EvaluationConfig) -
         )
 
 
-# --- Service Function to Get Models ---
-async def get_available_models() -> List[ModelInfo]:
+# --- Streaming Variant ---
+async def stream_model(
+    model_id: str,
+    prompt: str,
+    config: EvaluationConfig,
+    priority: str = admission.INTERACTIVE,
+    deadline: Optional[float] = None,
+) -> AsyncIterator[str]:
     """
-    Retrieves the list of available/deployed models.
-    TODO: Replace static list with dynamic logic (read from config, DB, etc.)
+    Returns a stream of generated text chunks from the backend serving model_id.
+    The provider's configuration is checked and the model's admission slot is
+    taken before this returns, so a missing API key/URL (503) or a shed request
+    (503 + Retry-After) is reported before any response has started. Closing the
+    stream (e.g. on client disconnect) closes the upstream connection, which
+    makes the provider stop generating. The admission slot and the provider's
+    limiter slot are held for the whole stream.
     """
-    # IN A REAL APP: Query your model sources here!
-    # This should reflect the *actual* configurable/deployable state.
-    all_models = [
-        ModelInfo(id="openai/gpt-4", name="GPT-4", source="OpenAI", deployed=True), # Assume deployed=True means 'configured'
-        ModelInfo(id="openai/gpt-3.5-turbo", name="GPT-3.5 Turbo", source="OpenAI", deployed=True),
-        ModelInfo(id="huggingface/google/gemma-7b-it", name="Gemma 7B Instruct", source="Hugging Face", deployed=False),
-        ModelInfo(id="huggingface/mistralai/Mistral-7B-Instruct-v0.2", name="Mistral 7B Instruct v0.2", source="Hugging Face", deployed=False),
-        # Check if Ollama URL is configured before listing local models?
-        ModelInfo(id="local/llama2", name="Llama 2 (Local Ollama)", source="Local", deployed=bool(settings.OLLAMA_BASE_URL)), # Example: Deployed if Ollama is configured
-        ModelInfo(id="local/my-finetuned-model", name="My Custom Model (Local Ollama)", source="Local", deployed=bool(settings.OLLAMA_BASE_URL)),
-    ]
-    # Filter or adjust based on actual deployment status/configuration checks
-    # For now, we return the list as defined, but the 'deployed' flag should be dynamic
-    return all_models
-
-
-# --- Service Function to Deploy/Undeploy (Placeholder) ---
+    provider = _provider_for(model_id)
+    if provider is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported or unknown model ID format: {model_id}"
+        )
+    _require_configured(model_id)
+    try:
+        slot = await admission.acquire_slot(model_id, priority, deadline)
+    except admission.OverloadedError as oe:
+        raise OverloadedHTTPException(oe) from oe
+    return slot.holding(_limited_stream(provider, model_id, prompt, config))
+
+async def _limited_stream(provider: str, model_id: str, prompt: str, config: EvaluationConfig) -> AsyncIterator[str]:
+    async with rate_limit.get_limiter(provider).acquire():
+        async for chunk in _stream(model_id, prompt, config):
+            yield chunk
+
+async def _stream(model_id: str, prompt: str, config: EvaluationConfig) -> AsyncIterator[str]:
+    if model_id.startswith('openai/'):
+        openai_model_name = model_id.split('/', 1)[1]
+        try:
+            stream = await get_async_openai_client().chat.completions.create(
+                model=openai_model_name,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=config.temperature,
+                max_tokens=config.maxTokens,
+                stream=True,
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+        except openai.APIError as e:
+            raise _openai_error(e) from e
+
+    elif model_id.startswith('huggingface/'):
+        hf_model_name = model_id.split('/', 1)[1]
+        payload = {
+            "inputs": prompt,
+            "parameters": {
+                "temperature": config.temperature,
+                "max_new_tokens": config.maxTokens,
+                "return_full_text": False,
+            },
+            "options": {"wait_for_model": True},
+            "stream": True, # Server-sent events, one token per event
+        }
+        try:
+            client = http_clients.get_client("huggingface")
+            async with client.stream(
+                "POST",
+                f"{settings.HUGGINGFACE_API_URL.rstrip('/')}/models/{hf_model_name}",
+                headers={"Authorization": f"Bearer {settings.HUGGINGFACE_API_TOKEN}"},
+                json=payload,
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[len("data:"):])
+                    token = event.get("token") or {}
+                    if token.get("text") and not token.get("special"):
+                        yield token["text"]
+        except httpx.HTTPStatusError as e:
+            logger.warning("HTTPStatusError streaming from HuggingFace: %s", e)
+            raise HTTPException(status_code=e.response.status_code, detail=f"HuggingFace API Error for {hf_model_name}: {e.response.status_code}") from e
+        except httpx.RequestError as e:
+            logger.warning("RequestError streaming from HuggingFace: %s", e)
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=f"Network error contacting HuggingFace: {e}") from e
+
+    elif model_id.startswith('local/'):
+        local_model_name = model_id.split('/', 1)[1]
+        ollama_url = routing.ollama_urls()[0] # Streams aren't routed: first replica; checked by stream_model
+        try:
+            client = http_clients.get_client("ollama")
+            async with client.stream(
+                "POST",
+                f"{ollama_url.rstrip('/')}/api/generate",
+                json={
+                    "model": local_model_name,
+                    "prompt": prompt,
+                    "stream": True, # Newline-delimited JSON, one chunk per line
+                    "options": {
+                        "temperature": config.temperature,
+                        "num_predict": config.maxTokens
+                    }
+                },
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+        except httpx.HTTPStatusError as e:
+             logger.warning("HTTPStatusError streaming from Ollama: %s", e)
+             raise HTTPException(status_code=e.response.status_code, detail=f"Ollama API Error ({local_model_name}): {e.response.status_code}") from e
+        except httpx.RequestError as e:
+             logger.warning("RequestError streaming from Ollama: %s", e)
+             raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=f"Network error contacting Ollama ({ollama_url}): {e}") from e
+
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported or unknown model ID format: {model_id}"
+        )
+
+
+# --- Service Function to Get Models ---
+def _provider_configured(model_id: str) -> bool:
+    """Whether the credentials/URL needed to reach a provider model are set."""
+    provider = _provider_for(model_id)
+    if provider == "openai":
+        return bool(settings.OPENAI_API_KEY)
+    if provider == "huggingface":
+        return bool(settings.HUGGINGFACE_API_TOKEN)
+    if provider == "ollama":
+        return bool(routing.ollama_urls())
+    return False
+
+def _model_info(entry: Dict[str, Any]) -> ModelInfo:
+    info = ModelInfo(
+        id=entry["id"],
+        name=entry["name"],
+        source=entry.get("source"),
+        deployed=get_registry().is_deployed(entry["id"]),
+        runtime=entry["runtime"],
+    )
+    if entry["runtime"] == "provider":
+        # A provider model only counts as deployed if it can actually be reached
+        info.deployed = info.deployed and _provider_configured(entry["id"])
+    else:
+        runtime_state = chat_service.get_model_runtime_state(entry["id"])
+        info.state = runtime_state["state"]
+        info.memory_bytes = runtime_state["memory_bytes"]
+    return info
+
+async def get_available_models(runtime: Optional[str] = None) -> List[ModelInfo]:
+    """Lists the registered models, optionally only those of one runtime, with their live state."""
+    return [_model_info(entry) for entry in get_registry().all(runtime)]
+
+
+# --- Service Function to Deploy/Undeploy ---
 async def set_model_deployment_status(model_id: str, deploy: bool) -> ModelInfo:
     """
-    Placeholder for changing a model's deployment status.
-    TODO: Implement actual logic (update config, DB, provision resources)
+    Deploys or undeploys a model.
+    Local models are pinned and preloaded in the background (deploy) or
+    unpinned and unloaded (undeploy); the returned state shows the progress.
+    Provider models only have their deployment flag changed.
     """
-    # 1. Find the model (this should come from a central registry/config)
-    # 2. Perform deployment/undeployment actions
-    # 3. Update the status in the central registry/config
-    # 4. Return the updated ModelInfo
-    print(f"Simulating {'deploy' if deploy else 'undeploy'} for {model_id}")
-    # Fetch current models again (or from cache/registry)
-    models = await get_available_models()
-    target_model = next((m for m in models if m.id == model_id), None)
-    if not target_model:
-         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Model '{model_id}' not found in configuration.")
-
-    # Simulate update
-    target_model.deployed = deploy
-    print(f"Simulated status for {model_id}: deployed={target_model.deployed}")
-
-    # In real app: Persist this change!
-
-    return target_model
\ No newline at end of file
+    registry = get_registry()
+    entry = registry.get(model_id)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Model '{model_id}' not found in configuration.")
+
+    if entry["runtime"] == "transformers":
+        if deploy:
+            chat_service.deploy_model(model_id)
+        else:
+            chat_service.undeploy_model(model_id)
+    registry.set_deployed(model_id, deploy)
+    logger.info("Model %s %s", model_id, "deployed" if deploy else "undeployed")
+    return _model_info(entry)
@@ -0,0 +1,245 @@
+# backend/app/services/metrics.py
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# Minimal Prometheus text-format metrics so the inference path can be scraped
+# without an extra dependency. Metrics are cheap to update from any thread:
+# one lock acquisition and a few integer/float updates per observation.
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; spans fast tokenization up to slow cold model loads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(v) for v in labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def labelsets(self) -> List[LabelValues]:
+        with self._lock:
+            return list(self._values)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels: str) -> Iterator[None]:
+        """Counts the enclosed block as in progress."""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - start)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(c), self._sums[k]) for k, c in self._counts.items()]
+        lines = []
+        bucket_labels = self.labelnames + ("le",)
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels, key + (_format_value(bound),))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# Collectors produce (name, help, type, [(labels dict, value)]) at scrape time
+# for state that already lives elsewhere (cache and queue counters).
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+_metrics: List[_Metric] = []
+_collectors: List[Collector] = []
+
+
+def _register(metric: _Metric) -> _Metric:
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collector: Collector) -> None:
+    _collectors.append(collector)
+
+
+def render() -> str:
+    """Returns every registered metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, documentation, kind, samples in collector():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Inference path metrics ---
+
+STAGE_SECONDS = _register(Histogram(
+    "llmforge_stage_seconds",
+    "Latency of each local inference stage (queue_wait, model_load, tokenization, generation, postprocess).",
+    ("model", "stage"),
+))
+GENERATED_TOKENS = _register(Counter(
+    "llmforge_generated_tokens_total", "Tokens generated by local models.", ("model",),
+))
+TOKENS_PER_SECOND = _register(Histogram(
+    "llmforge_generation_tokens_per_second",
+    "Generation throughput per forward call of local models.",
+    ("model",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000),
+))
+IN_FLIGHT = _register(Gauge(
+    "llmforge_in_flight_requests", "Requests currently being served, per model.", ("model",),
+))
+REQUESTS = _register(Counter(
+    "llmforge_requests_total", "Completed requests per model and outcome.", ("model", "outcome"),
+))
+DRAFT_TOKENS = _register(Counter(
+    "llmforge_speculative_draft_tokens_total", "Tokens proposed by draft models in assisted decoding.", ("model",),
+))
+ACCEPTED_DRAFT_TOKENS = _register(Counter(
+    "llmforge_speculative_accepted_tokens_total", "Draft tokens accepted by the target model.", ("model",),
+))
+TARGET_PASSES = _register(Counter(
+    "llmforge_speculative_target_passes_total", "Target model forward passes in assisted decoding.", ("model",),
+))
+ROUTING_ATTEMPTS = _register(Counter(
+    "llmforge_routing_attempts_total", "Provider call attempts per backend and outcome (ok, error, cancelled).",
+    ("backend", "outcome"),
+))
+PROVIDER_SECONDS = _register(Histogram(
+    "llmforge_provider_request_seconds",
+    "Latency of provider calls made by llm_service, excluding rate-limiter wait.",
+    ("provider",),
+))
+
+
+def observe_stage(model: str, stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(model, stage, value=seconds)
+
+
+def observe_tokens(model: str, tokens: int, seconds: float) -> None:
+    if tokens <= 0:
+        return
+    GENERATED_TOKENS.inc(model, amount=tokens)
+    if seconds > 0:
+        TOKENS_PER_SECOND.observe(model, value=tokens / seconds)
@@ -0,0 +1,182 @@
+# backend/app/services/model_cache.py
+import gc
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_pipeline_bytes(pipe: Any) -> int:
+    """Estimates the resident size of a pipeline from its parameter and buffer tensors.
+
+    Tied weights (e.g. GPT-2's lm_head/wte) share storage, so tensors are
+    de-duplicated by data pointer before summing. Tensor element sizes make
+    the estimate follow the loaded precision (bf16, int8).
+    """
+    model = getattr(pipe, "model", pipe)
+    if not hasattr(model, "parameters"):
+        return 0
+
+    seen = set()
+    total = 0
+    tensors = list(model.parameters())
+    if hasattr(model, "buffers"):
+        tensors.extend(model.buffers())
+    # Dynamically quantized Linear layers keep their int8 weights in packed
+    # params rather than as parameters
+    if hasattr(model, "modules"):
+        for module in model.modules():
+            packed = getattr(module, "_packed_params", None)
+            if packed is not None and hasattr(packed, "_weight_bias"):
+                tensors.extend(t for t in packed._weight_bias() if t is not None)
+    for tensor in tensors:
+        ptr = tensor.data_ptr()
+        if ptr in seen:
+            continue
+        seen.add(ptr)
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class _CacheEntry:
+    __slots__ = ("value", "size_bytes", "load_time_s", "last_used")
+
+    def __init__(self, value: Any, size_bytes: int, load_time_s: float):
+        self.value = value
+        self.size_bytes = size_bytes
+        self.load_time_s = load_time_s
+        self.last_used = time.monotonic()
+
+
+class ModelCache:
+    """LRU cache for loaded pipelines bounded by an estimated byte budget.
+
+    Pinned keys are never evicted. If a new entry does not fit even after
+    evicting every unpinned entry it is still stored (a model that was just
+    requested has to live somewhere) and the cache runs over budget until the
+    next insert.
+    """
+
+    def __init__(self, max_bytes: int, pinned: Optional[Iterable[str]] = None):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._pinned = set(pinned or [])
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+        self.total_load_time_s = 0.0
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(e.size_bytes for e in self._entries.values())
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value and marks it most recently used, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.last_used = time.monotonic()
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: str, value: Any, size_bytes: Optional[int] = None, load_time_s: float = 0.0) -> None:
+        """Stores a value, evicting least-recently-used unpinned entries to make room."""
+        if size_bytes is None:
+            size_bytes = estimate_pipeline_bytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._make_room(size_bytes)
+            self._entries[key] = _CacheEntry(value, size_bytes, load_time_s)
+            self.loads += 1
+            self.total_load_time_s += load_time_s
+            if self.used_bytes > self.max_bytes:
+                logger.warning(
+                    "Model cache over budget after loading %s: %d / %d bytes",
+                    key, self.used_bytes, self.max_bytes,
+                )
+
+    def size_of(self, key: str) -> Optional[int]:
+        """Estimated bytes of a cached entry, or None if it isn't resident."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.size_bytes if entry is not None else None
+
+    def evict(self, key: str) -> bool:
+        """Removes a key regardless of pin state. Returns True if it was present."""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            self.evictions += 1
+        gc.collect()
+        return True
+
+    def pin(self, key: str) -> None:
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key: str) -> None:
+        with self._lock:
+            self._pinned.discard(key)
+
+    def is_pinned(self, key: str) -> bool:
+        with self._lock:
+            return key in self._pinned
+
+    def _remove(self, key: str) -> None:
+        del self._entries[key]
+
+    def _make_room(self, needed: int) -> None:
+        evicted = False
+        for key in list(self._entries.keys()):  # oldest first
+            if self.used_bytes + needed <= self.max_bytes:
+                break
+            if key in self._pinned:
+                continue
+            logger.info("Evicting model %s from cache (LRU)", key)
+            self._remove(key)
+            self.evictions += 1
+            evicted = True
+        if evicted:
+            gc.collect()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "max_bytes": self.max_bytes,
+                "used_bytes": self.used_bytes,
+                "entries": {
+                    key: {
+                        "size_bytes": e.size_bytes,
+                        "load_time_s": round(e.load_time_s, 3),
+                        "pinned": key in self._pinned,
+                    }
+                    for key, e in self._entries.items()
+                },
+                "pinned": sorted(self._pinned),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "loads": self.loads,
+                "total_load_time_s": round(self.total_load_time_s, 3),
+            }
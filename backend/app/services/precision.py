@@ -0,0 +1,44 @@
+# backend/app/services/precision.py
+from typing import Any, Dict, Optional
+
+# Load modes for local models, set per model with "precision" in the model registry (core/models.json):
+#   fp32 - full precision (default)
+#   bf16 - weights and activations in bfloat16; halves memory, fast on CPUs with AVX512-BF16/AMX
+#   int8 - dynamic int8 quantization of nn.Linear layers; weights stored as int8,
+#          activations quantized on the fly. GPT-2 style models implement most
+#          projections with Conv1D, so only their nn.Linear layers (e.g. lm_head) shrink.
+PRECISIONS = ("fp32", "bf16", "int8")
+DEFAULT_PRECISION = "fp32"
+
+
+def get_precision(model_config: Optional[Dict[str, Any]]) -> str:
+    """Returns the configured precision of a model entry, validating it."""
+    precision = (model_config or {}).get("precision", DEFAULT_PRECISION)
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unsupported precision '{precision}'; expected one of {', '.join(PRECISIONS)}")
+    return precision
+
+
+def variant_key(model_id: str, precision: str) -> str:
+    """Cache key of one loaded variant of a model, e.g. 'distilgpt2@int8'."""
+    return f"{model_id}@{precision}"
+
+
+def load_kwargs(precision: str) -> Dict[str, Any]:
+    """Extra from_pretrained() kwargs for a precision."""
+    import torch
+
+    if precision == "bf16":
+        return {"torch_dtype": torch.bfloat16}
+    return {} # int8 is applied after loading in fp32
+
+
+def apply_precision(model: Any, precision: str) -> Any:
+    """Post-load conversion for a precision; returns the model to use."""
+    if precision != "int8":
+        return model
+    import torch
+
+    model.eval()
+    # In place, so the fp32 Linear weights are released instead of copied
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
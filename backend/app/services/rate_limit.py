@@ -0,0 +1,122 @@
+# backend/app/services/rate_limit.py
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from ..core.config import settings
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursting up to `capacity`.
+
+    Waiters sleep until a token is available instead of spinning, so the event
+    loop stays free while callers are throttled.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return # Unlimited
+        # The lock keeps waiters in FIFO order
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class ProviderLimiter:
+    """Concurrency + rate limit for one provider with a bounded wait queue.
+
+    Callers beyond `max_queue` waiting requests are rejected immediately with
+    429 so overload turns into backpressure instead of an ever-growing backlog.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, rate_per_s: float, burst: float, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_per_s, burst)
+        self.waiting = 0
+        self.active = 0
+        self.rejected = 0
+
+    def _retry_after_s(self) -> int:
+        rate = self._bucket.rate
+        if rate > 0:
+            return max(1, math.ceil(self.waiting / rate))
+        return 1
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Too many queued requests for provider '{self.name}'. Retry later.",
+                headers={"Retry-After": str(self._retry_after_s())},
+            )
+        self.waiting += 1
+        try:
+            await self._bucket.acquire()
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "rate_per_s": self._bucket.rate,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """Returns the (lazily created) limiter for a provider."""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        rate = settings.PROVIDER_RATE_PER_S.get(provider, 0.0)
+        limiter = ProviderLimiter(
+            name=provider,
+            max_concurrency=settings.PROVIDER_MAX_CONCURRENCY.get(provider, 8),
+            rate_per_s=rate,
+            burst=settings.PROVIDER_RATE_BURST.get(provider, rate),
+            max_queue=settings.PROVIDER_MAX_QUEUE,
+        )
+        _limiters[provider] = limiter
+    return limiter
+
+
+def get_limiter_stats(provider: Optional[str] = None) -> Dict[str, Any]:
+    if provider is not None:
+        return get_limiter(provider).stats()
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
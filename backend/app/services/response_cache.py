@@ -0,0 +1,288 @@
+# backend/app/services/response_cache.py
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.config import settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalizes a prompt for cache lookups (unicode form, line endings, outer whitespace)."""
+    return unicodedata.normalize("NFC", prompt).replace("\r\n", "\n").strip()
+
+
+def make_key(namespace: str, model_id: str, prompt: str, params: Dict[str, Any]) -> str:
+    """Builds a stable cache key from the model, the normalized prompt and the generation params."""
+    payload = json.dumps(
+        [namespace, model_id, normalize_prompt(prompt), params],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU store of (value, expires_at) pairs bounded by entry count."""
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, expires_at: Optional[float]) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)  # least recently used
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteBackend:
+    """On-disk LRU store in a single SQLite file, so cached generations survive restarts.
+
+    Recency is tracked in a `last_used` column; once the table holds more than
+    ``max_entries`` rows the least recently used ones are deleted. The row
+    count is kept in memory so writes don't scan the table.
+    """
+
+    name = "sqlite"
+    blocking = True # Callers on the event loop go through a worker thread
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self.evictions = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        (self._rows,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._rows -= self._conn.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: str, expires_at: Optional[float]) -> None:
+        now = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE responses SET value = ?, expires_at = ?, last_used = ? WHERE key = ?",
+                (value, expires_at, now, key),
+            ).rowcount
+            if updated:
+                return
+            self._conn.execute(
+                "INSERT INTO responses (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            self._rows += 1
+            overflow = self._rows - self.max_entries
+            if overflow > 0:
+                # Uses the last_used index: no full scan
+                deleted = self._conn.execute(
+                    "DELETE FROM responses WHERE key IN"
+                    " (SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                ).rowcount
+                self._rows -= deleted
+                self.evictions += deleted
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._rows -= self._conn.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._rows = 0
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """Caches generated text for deterministic requests on top of a storage backend.
+
+    Callers decide whether a request is deterministic and build the key with
+    :func:`make_key`; the cache only applies the TTL and keeps hit/miss
+    counters per namespace (e.g. ``chat`` and ``evaluate``).
+    """
+
+    def __init__(self, backend: Any, ttl_s: float = 0.0):
+        self.backend = backend
+        self.ttl_s = ttl_s
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, namespace: str, field: str) -> None:
+        counters = self._counters.setdefault(namespace, {"hits": 0, "misses": 0, "bypassed": 0})
+        counters[field] += 1
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:  # A broken cache must never fail the request
+            logger.warning("Response cache lookup failed: %s", e)
+            value = None
+        self._count(namespace, "misses" if value is None else "hits")
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl_s if self.ttl_s > 0 else None
+        try:
+            self.backend.set(key, value, expires_at)
+        except Exception as e:
+            logger.warning("Response cache store failed: %s", e)
+
+    async def aget(self, namespace: str, key: str) -> Optional[str]:
+        """get() for callers on the event loop: blocking backends run in a worker thread."""
+        if self.backend.blocking:
+            return await asyncio.to_thread(self.get, namespace, key)
+        return self.get(namespace, key)
+
+    async def aset(self, key: str, value: str) -> None:
+        if self.backend.blocking:
+            await asyncio.to_thread(self.set, key, value)
+        else:
+            self.set(key, value)
+
+    def record_bypass(self, namespace: str) -> None:
+        """Counts a request that skipped the cache (non-deterministic or opted out)."""
+        self._count(namespace, "bypassed")
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = sum(c["hits"] for c in self._counters.values())
+        misses = sum(c["misses"] for c in self._counters.values())
+        lookups = hits + misses
+        return {
+            "backend": self.backend.name,
+            "entries": len(self.backend),
+            "max_entries": self.backend.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": (hits / lookups) if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "namespaces": {
+                name: dict(c, hit_ratio=(c["hits"] / (c["hits"] + c["misses"])) if c["hits"] + c["misses"] else 0.0)
+                for name, c in self._counters.items()
+            },
+        }
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Returns the (lazily created) response cache, or None when it is disabled."""
+    global _cache
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        if settings.RESPONSE_CACHE_BACKEND == "sqlite":
+            backend = SQLiteBackend(settings.RESPONSE_CACHE_SQLITE_PATH, settings.RESPONSE_CACHE_MAX_ENTRIES)
+        elif settings.RESPONSE_CACHE_BACKEND == "memory":
+            backend = MemoryBackend(settings.RESPONSE_CACHE_MAX_ENTRIES)
+        else:
+            raise ValueError(f"Unknown response cache backend: {settings.RESPONSE_CACHE_BACKEND}")
+        _cache = ResponseCache(backend, ttl_s=settings.RESPONSE_CACHE_TTL_S)
+        logger.info("Response cache enabled (%s backend)", backend.name)
+    return _cache
+
+
+def shutdown() -> None:
+    """Closes the on-disk backend, if any. Called from the FastAPI lifespan."""
+    global _cache
+    if _cache is not None and hasattr(_cache.backend, "close"):
+        _cache.backend.close()
+    _cache = None
+
+
+def get_response_cache_stats() -> Dict[str, Any]:
+    cache = get_response_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+
+def _collect_metrics():
+    """Exposes response cache size and per-namespace hit/miss counters to /metrics."""
+    if _cache is None:
+        return
+    stats = _cache.stats()
+    yield ("llmforge_response_cache_entries", "Entries in the response cache.", "gauge", [({}, stats["entries"])])
+    for field in ("hits", "misses", "bypassed"):
+        yield (
+            f"llmforge_response_cache_{field}_total",
+            f"Response cache {field} per namespace.",
+            "counter",
+            [({"namespace": name}, c[field]) for name, c in stats["namespaces"].items()],
+        )
+
+
+metrics.register_collector(_collect_metrics)
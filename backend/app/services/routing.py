@@ -0,0 +1,352 @@
+# backend/app/services/routing.py
+import asyncio
+import itertools
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, status
+
+from ..core.config import get_model_config, settings
+from . import metrics, rate_limit
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("round_robin", "least_latency")
+
+
+class NotConfiguredError(HTTPException):
+    """503 for a backend whose credentials/URL aren't set: a setup problem, never retried or held against its circuit."""
+
+    def __init__(self, detail: str):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail)
+
+
+def is_retryable(status_code: int) -> bool:
+    """Upstream answers worth another attempt (on this or another backend): timeouts, 429 and 5xx."""
+    return status_code in (status.HTTP_408_REQUEST_TIMEOUT, status.HTTP_429_TOO_MANY_REQUESTS) or status_code >= 500
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and stays open for `cooldown_s`.
+
+    After the cooldown one probe request is let through (half-open); its
+    outcome closes the breaker again or re-opens it for another cooldown.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_s: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_s = cooldown_s
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def available(self) -> bool:
+        """Whether a request would be let through now (without claiming the probe)."""
+        if self.state == "open":
+            return time.monotonic() - self.opened_at >= self.cooldown_s
+        return self.state == "closed" or not self._probing
+
+    def allow(self) -> bool:
+        """Lets a request through, claiming the single probe slot when half-open."""
+        if not self.available():
+            return False
+        if self.state == "open":
+            self.state = "half_open"
+        if self.state == "half_open":
+            self._probing = True
+        return True
+
+    def release_probe(self) -> None:
+        """The probe ended without a verdict (cancelled, rate-limited): let the next request probe instead."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("Circuit opened after %d failures", self.failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class Backend:
+    """One place a model can be served from: a provider, or one Ollama replica, plus its health."""
+
+    def __init__(self, name: str, provider: str, model_id: str, base_url: Optional[str] = None):
+        self.name = name
+        self.provider = provider
+        self.model_id = model_id # Provider-prefixed ID to call, e.g. "local/llama2"
+        self.base_url = base_url
+        self.breaker = CircuitBreaker(settings.ROUTING_BREAKER_FAILURES, settings.ROUTING_BREAKER_COOLDOWN_S)
+        self.latency_s: Optional[float] = None # Moving average of completed and cancelled calls
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.last_error: Optional[str] = None
+
+    def score(self) -> float:
+        """Expected latency of one more request; untried backends come first."""
+        return (self.latency_s or 0.0) * (1 + self.in_flight)
+
+    def _observe(self, seconds: float) -> None:
+        self.latency_s = seconds if self.latency_s is None else 0.8 * self.latency_s + 0.2 * seconds
+
+    def record_success(self, seconds: float) -> None:
+        self.successes += 1
+        self._observe(seconds)
+        self.breaker.record_success()
+
+    def record_cancelled(self, seconds: float) -> None:
+        """A call abandoned after `seconds` (e.g. it lost a hedge race): a lower bound on its latency.
+
+        Without it a replica that never answers keeps scoring as untried and stays the primary.
+        """
+        self.cancelled += 1
+        self._observe(seconds)
+
+    def record_failure(self, error: str) -> None:
+        self.failures += 1
+        self.last_error = error
+        self.breaker.record_failure()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "model_id": self.model_id,
+            "state": self.breaker.state,
+            "latency_s": round(self.latency_s, 3) if self.latency_s is not None else None,
+            "in_flight": self.in_flight,
+            "successes": self.successes,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "last_error": self.last_error,
+        }
+
+
+class _AttemptFailed(Exception):
+    def __init__(self, error: HTTPException, retryable: bool):
+        super().__init__(str(error.detail))
+        self.error = error
+        self.retryable = retryable
+
+
+# Performs one call on one backend; raises HTTPException on failure
+BackendCall = Callable[[Backend], Awaitable[str]]
+
+
+class Router:
+    """Routes provider calls for a model over its backends.
+
+    Candidates are replicas of the requested model only (one per Ollama URL
+    for local/ models), so whichever answers, the response is that model's
+    and can be cached under its ID. They are ordered by the routing policy;
+    backends with an open circuit are skipped. Failed attempts with a retryable status move
+    to the next candidate after a jittered exponential backoff. With a hedge
+    delay set, a second request goes to the next candidate if the first
+    hasn't answered by then; the first response wins and the other is cancelled.
+    """
+
+    def __init__(self, policy: str):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown routing policy '{policy}'; expected one of {', '.join(POLICIES)}")
+        self.policy = policy
+        self._backends: Dict[str, Backend] = {}
+        self._rotation: Dict[str, "itertools.count"] = {}
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _backend(self, name: str, provider: str, model_id: str, base_url: Optional[str] = None) -> Backend:
+        backend = self._backends.get(name)
+        if backend is None:
+            backend = Backend(name, provider, model_id, base_url)
+            self._backends[name] = backend
+        return backend
+
+    def _backends_for(self, model_id: str, provider: str) -> List[Backend]:
+        if provider != "ollama":
+            return [self._backend(f"{provider}:{model_id}", provider, model_id)]
+        urls = ollama_urls()
+        backends = [self._backend(f"ollama:{model_id}@{url}", provider, model_id, url) for url in urls]
+        if self.policy == "least_latency":
+            return sorted(backends, key=Backend.score)
+        start = next(self._rotation.setdefault(model_id, itertools.count())) % max(1, len(backends))
+        return backends[start:] + backends[:start]
+
+    def plan(self, model_id: str, provider_for: Callable[[str], Optional[str]]) -> List[Backend]:
+        """Candidate backends for a model in the order they should be tried."""
+        provider = provider_for(model_id)
+        return self._backends_for(model_id, provider) if provider is not None else []
+
+    async def _attempt(self, backend: Backend, call: BackendCall) -> str:
+        if not backend.breaker.allow():
+            # Another request claimed the half-open probe first
+            error = HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Circuit open for {backend.name}")
+            raise _AttemptFailed(error, retryable=True)
+        # The breaker must hear how the attempt ended, or a claimed half-open probe is never released
+        recorded = False
+        try:
+            # Limiter rejections (429) are our own backpressure: they propagate as they are
+            async with rate_limit.get_limiter(backend.provider).acquire():
+                backend.in_flight += 1
+                start = time.perf_counter()
+                try:
+                    with metrics.PROVIDER_SECONDS.time(backend.provider):
+                        result = await call(backend)
+                except NotConfiguredError as e:
+                    metrics.ROUTING_ATTEMPTS.inc(backend.name, "error")
+                    raise _AttemptFailed(e, retryable=False) from e
+                except HTTPException as e:
+                    retryable = is_retryable(e.status_code)
+                    if retryable:
+                        backend.record_failure(f"{e.status_code}: {e.detail}")
+                    else:
+                        backend.breaker.record_success() # It answered: a client error, not an outage
+                    recorded = True
+                    metrics.ROUTING_ATTEMPTS.inc(backend.name, "error")
+                    raise _AttemptFailed(e, retryable) from e
+                except asyncio.CancelledError:
+                    backend.record_cancelled(time.perf_counter() - start)
+                    metrics.ROUTING_ATTEMPTS.inc(backend.name, "cancelled")
+                    raise
+                except Exception as e:
+                    # E.g. an unparseable response body: the backend misbehaved
+                    backend.record_failure(f"{type(e).__name__}: {e}")
+                    recorded = True
+                    metrics.ROUTING_ATTEMPTS.inc(backend.name, "error")
+                    raise
+                finally:
+                    backend.in_flight -= 1
+                backend.record_success(time.perf_counter() - start)
+                recorded = True
+                metrics.ROUTING_ATTEMPTS.inc(backend.name, "ok")
+                return result
+        finally:
+            if not recorded:
+                backend.breaker.release_probe() # Cancelled or rejected by the limiter: no verdict
+
+    async def _race(
+        self, primary: Backend, hedge: Optional[Backend], hedge_after_s: float, call: BackendCall, tries: Dict[str, int]
+    ) -> str:
+        """Runs the primary attempt, adding a hedged one on `hedge` if it is still running after hedge_after_s.
+
+        `tries` counts attempts per backend name, only for attempts that were actually started.
+        """
+        def launch(backend: Backend) -> "asyncio.Future":
+            tries[backend.name] = tries.get(backend.name, 0) + 1
+            return asyncio.ensure_future(self._attempt(backend, call))
+
+        first = launch(primary)
+        tasks = {first}
+        try:
+            if hedge is None:
+                return await first
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after_s)
+            if done:
+                return first.result()
+            self.hedges += 1
+            logger.info("Hedging %s after %.2fs with %s", primary.name, hedge_after_s, hedge.name)
+            second = launch(hedge)
+            tasks.add(second)
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel() # The losing request; closing its connection stops the provider
+            if losers:
+                # Let them record their elapsed time before the next request is planned
+                await asyncio.gather(*losers, return_exceptions=True)
+
+    async def call(self, model_id: str, call: BackendCall, provider_for: Callable[[str], Optional[str]]) -> str:
+        """Performs `call` on the model's backends per the routing policy. Raises the last HTTPException."""
+        model_config = get_model_config(model_id) or {}
+        hedge_after_s = model_config.get("hedge_after_s", settings.ROUTING_HEDGE_AFTER_S)
+        plan = self.plan(model_id, provider_for)
+        if not plan:
+            # Only Ollama can have no backends: neither OLLAMA_BASE_URLS nor OLLAMA_BASE_URL is set
+            raise NotConfiguredError("Ollama base URL not configured.")
+        tries: Dict[str, int] = {}
+        last_error: Optional[HTTPException] = None
+        for attempt in range(settings.ROUTING_MAX_RETRIES + 1):
+            # Least-tried healthy backends first, in plan order
+            candidates = sorted((b for b in plan if b.breaker.available()), key=lambda b: tries.get(b.name, 0))
+            if not candidates:
+                break
+            if attempt:
+                # Full jitter: spreads retries out instead of synchronizing them
+                backoff = min(settings.ROUTING_BACKOFF_MAX_S, settings.ROUTING_BACKOFF_BASE_S * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, backoff))
+            primary = candidates[0]
+            hedge = candidates[1] if hedge_after_s > 0 and len(candidates) > 1 else None
+            try:
+                return await self._race(primary, hedge, hedge_after_s, call, tries)
+            except _AttemptFailed as failed:
+                last_error = failed.error
+                if not failed.retryable:
+                    raise failed.error from None
+                logger.warning("Attempt %d for %s on %s failed: %s", attempt + 1, model_id, primary.name, failed)
+        if last_error is not None:
+            raise last_error
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"No healthy backend for {model_id}: every circuit is open.",
+            headers={"Retry-After": str(max(1, int(settings.ROUTING_BREAKER_COOLDOWN_S)))},
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "backends": {name: b.stats() for name, b in self._backends.items()},
+        }
+
+
+def ollama_urls() -> List[str]:
+    """Ollama replicas: OLLAMA_BASE_URLS, or the single OLLAMA_BASE_URL."""
+    if settings.OLLAMA_BASE_URLS:
+        return list(settings.OLLAMA_BASE_URLS)
+    return [settings.OLLAMA_BASE_URL] if settings.OLLAMA_BASE_URL else []
+
+
+_router: Optional[Router] = None
+
+
+def get_router() -> Router:
+    global _router
+    if _router is None:
+        _router = Router(settings.ROUTING_POLICY)
+    return _router
+
+
+def get_routing_stats() -> Dict[str, Any]:
+    return get_router().stats()
+
+
+def _collect_metrics():
+    """Exposes circuit state per backend to /metrics (0 closed, 1 half-open, 2 open)."""
+    levels = {"closed": 0, "half_open": 1, "open": 2}
+    backends = list(_router._backends.values()) if _router is not None else []
+    yield ("llmforge_backend_circuit_state", "Circuit breaker state per backend (0 closed, 1 half-open, 2 open).",
+           "gauge", [({"backend": b.name}, levels[b.breaker.state]) for b in backends])
+
+metrics.register_collector(_collect_metrics)
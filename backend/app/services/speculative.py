@@ -0,0 +1,119 @@
+# backend/app/services/speculative.py
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Assisted (speculative) decoding: a small draft model proposes a few tokens,
+# the target model checks them all in one forward pass and keeps the longest
+# prefix it agrees with plus one token of its own. Greedy output is identical
+# to decoding with the target alone; the gain is fewer target forward passes.
+#
+# Counting happens per pipeline call in thread-local counters, so concurrent
+# generations of the same model don't mix up their numbers.
+
+_local = threading.local()
+
+
+@contextmanager
+def counting() -> Iterator[Dict[str, int]]:
+    """Counts the target and draft forward passes run in this thread inside the block.
+
+    Only models passed through enable() are counted. The yielded dict holds
+    "target" and "draft"; nested blocks also add their counts to the outer one.
+    """
+    outer = getattr(_local, "counts", None)
+    counts = {"target": 0, "draft": 0}
+    _local.counts = counts
+    try:
+        yield counts
+    finally:
+        _local.counts = outer
+        if outer is not None:
+            for field, n in counts.items():
+                outer[field] += n
+
+
+def _counting(forward: Callable, field: str) -> Callable:
+    def wrapper(*args, **kwargs):
+        counts = getattr(_local, "counts", None)
+        if counts is not None:
+            counts[field] += 1
+        return forward(*args, **kwargs)
+    return wrapper
+
+
+def check_compatible(model: Any, draft_model: Any) -> None:
+    """Raises ValueError unless the draft can propose tokens for the target (same vocabulary)."""
+    if draft_model.config.is_encoder_decoder or model.config.is_encoder_decoder:
+        raise ValueError("Assisted decoding is only configured for causal models")
+    if draft_model.config.vocab_size != model.config.vocab_size:
+        raise ValueError(
+            f"Draft vocabulary ({draft_model.config.vocab_size}) differs from the target's ({model.config.vocab_size})"
+        )
+
+
+def enable(pipe: Any, draft_model: Any, model_id: str, count_new_tokens: Callable[[Any], int],
+           num_assistant_tokens: int = 0) -> None:
+    """Makes every generation of `pipe` use `draft_model` and records acceptance metrics.
+
+    The draft is kept on the pipeline (``pipe.draft_model``) so both live in
+    one model cache entry. Assisted generation handles one sequence at a time,
+    so callers must not batch prompts for this pipeline.
+    """
+    check_compatible(pipe.model, draft_model)
+    if num_assistant_tokens:
+        draft_model.generation_config.num_assistant_tokens = num_assistant_tokens
+    pipe.draft_model = draft_model
+    # Each target pass checks one round of candidates; each draft pass proposes one token
+    pipe.model.forward = _counting(pipe.model.forward, "target")
+    draft_model.forward = _counting(draft_model.forward, "draft")
+
+    forward = pipe._forward
+
+    def assisted_forward(model_inputs, **generate_kwargs):
+        generate_kwargs.setdefault("assistant_model", draft_model)
+        with counting() as counts:
+            outputs = forward(model_inputs, **generate_kwargs)
+        try:
+            new_tokens = count_new_tokens(outputs)
+        except Exception: # Unknown output layout; skip this call's numbers
+            return outputs
+        # Every round yields the accepted draft tokens plus one token from the target
+        accepted = max(0, new_tokens - counts["target"])
+        metrics.DRAFT_TOKENS.inc(model_id, amount=counts["draft"])
+        metrics.ACCEPTED_DRAFT_TOKENS.inc(model_id, amount=min(accepted, counts["draft"]))
+        metrics.TARGET_PASSES.inc(model_id, amount=counts["target"])
+        return outputs
+
+    pipe._forward = assisted_forward
+
+
+def stats(model_id: str) -> Dict[str, Any]:
+    """Acceptance rate and tokens per target pass (the ideal speedup over plain decoding)."""
+    draft = metrics.DRAFT_TOKENS.value(model_id)
+    accepted = metrics.ACCEPTED_DRAFT_TOKENS.value(model_id)
+    passes = metrics.TARGET_PASSES.value(model_id)
+    return {
+        "draft_tokens": int(draft),
+        "accepted_tokens": int(accepted),
+        "target_passes": int(passes),
+        "acceptance_rate": round(accepted / draft, 4) if draft else None,
+        "tokens_per_target_pass": round((accepted + passes) / passes, 3) if passes else None,
+    }
+
+
+def _collect_metrics():
+    """Exposes the derived acceptance rate and tokens per target pass to /metrics."""
+    views = [(labels[0], stats(labels[0])) for labels in metrics.TARGET_PASSES.labelsets()]
+    yield ("llmforge_speculative_acceptance_ratio", "Share of draft tokens accepted by the target model.", "gauge",
+           [({"model": m}, v["acceptance_rate"]) for m, v in views if v["acceptance_rate"] is not None])
+    yield ("llmforge_speculative_tokens_per_target_pass",
+           "Tokens generated per target forward pass (ideal speedup over plain decoding).", "gauge",
+           [({"model": m}, v["tokens_per_target_pass"]) for m, v in views if v["tokens_per_target_pass"] is not None])
+
+metrics.register_collector(_collect_metrics)
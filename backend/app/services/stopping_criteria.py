@@ -0,0 +1,29 @@
+# backend/app/services/stopping_criteria.py
+# Imports transformers at module load: import this module inside the
+# functions that generate, never at the top of a service module.
+import threading
+
+from transformers import StoppingCriteria
+
+
+class CancelCriteria(StoppingCriteria):
+    """Stops generate() as soon as the request's cancel event is set."""
+
+    def __init__(self, cancel_event: threading.Event):
+        self.cancel_event = cancel_event
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.cancel_event.is_set()
+
+
+class StopOnText(StoppingCriteria):
+    """Stops generate() once the newly generated text contains `text` (the model starts the next user turn)."""
+
+    def __init__(self, tokenizer, text: str, prompt_len: int):
+        self.tokenizer = tokenizer
+        self.text = text
+        self.prompt_len = prompt_len
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        tail = input_ids[0, self.prompt_len:][-8:]
+        return self.text in self.tokenizer.decode(tail, skip_special_tokens=True)
@@ -0,0 +1,71 @@
+# backend/app/services/warmup.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+from ..core.registry import get_registry
+from . import chat_service
+
+logger = logging.getLogger(__name__)
+
+# Warm-up progress, reported by /api/ready
+_status: Dict[str, Any] = {
+    "state": "pending", # pending -> running -> done
+    "started_at": None,
+    "finished_at": None,
+    "models": {},
+}
+_task: Optional["asyncio.Task"] = None
+
+
+async def _warm_up(model_ids: List[str]) -> None:
+    _status.update(state="running", started_at=time.time())
+    for model_id in model_ids:
+        _status["models"][model_id] = {"state": "loading"}
+        try:
+            timings = await chat_service.warm_up_model(
+                model_id, settings.WARMUP_PROMPT, compile=settings.WARMUP_TORCH_COMPILE
+            )
+        except Exception as e:
+            logger.error("Warm-up of %s failed: %s", model_id, e)
+            _status["models"][model_id] = {"state": "failed", "error": str(e)}
+            continue
+        get_registry().set_deployed(model_id, True) # Pinned and resident, same as a deploy
+        _status["models"][model_id] = {"state": "ready", **timings}
+        logger.info("Warmed up %s: %s", model_id, timings)
+    _status.update(state="done", finished_at=time.time())
+
+
+async def startup() -> None:
+    """Starts warming up WARMUP_MODELS; awaits it only with WARMUP_BLOCKING. Called from the FastAPI lifespan."""
+    global _task
+    model_ids = list(settings.WARMUP_MODELS)
+    if not model_ids:
+        _status.update(state="done", started_at=time.time(), finished_at=time.time())
+        return
+    # Models run one after another so their loads don't compete for CPU and disk
+    _task = asyncio.ensure_future(_warm_up(model_ids))
+    if settings.WARMUP_BLOCKING:
+        await _task
+
+
+async def shutdown() -> None:
+    if _task is not None and not _task.done():
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+
+
+def is_ready() -> bool:
+    return _status["state"] == "done"
+
+
+def get_status() -> Dict[str, Any]:
+    """Returns warm-up state, elapsed time and per-model timings or errors."""
+    view = dict(_status)
+    if _status["started_at"] is not None:
+        end = _status["finished_at"] or time.time()
+        view["elapsed_s"] = round(end - _status["started_at"], 3)
+    view["ready"] = is_ready()
+    return view
@@ -0,0 +1,216 @@
+# backend/app/services/worker_pool.py
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worker processes are spawned (not forked) so they don't inherit the parent's
+# torch thread pools or event loop. This module therefore keeps its imports
+# light: torch/transformers are only imported inside the worker functions.
+_mp_context = multiprocessing.get_context("spawn")
+
+# The pipeline owned by the current worker process
+_worker_pipe = None
+
+
+def configure_tokenizer(tokenizer, task: str) -> None:
+    """Prepares a tokenizer for batched generation."""
+    # Batched generation needs a pad token; GPT-style tokenizers don't define one
+    if tokenizer.pad_token is None and tokenizer.eos_token is not None:
+        tokenizer.pad_token = tokenizer.eos_token
+    if task == "text-generation":
+        tokenizer.padding_side = "left" # Decoder-only models must be left-padded in a batch
+
+
+def _export_weights(model_id: str, model_class_name: str, precision: str, path: str) -> None:
+    """Saves a model's state dict to `path` so workers can memory-map it (runs in a child process)."""
+    import torch
+    import transformers
+    from .precision import load_kwargs
+
+    model = getattr(transformers, model_class_name).from_pretrained(model_id, **load_kwargs(precision))
+    tmp_path = f"{path}.tmp"
+    torch.save(model.state_dict(), tmp_path) # Tied weights are stored once
+    os.replace(tmp_path, path)
+
+
+def _init_worker(
+    model_id: str, task: str, model_class_name: str, precision: str, weights_path: str, torch_threads: int
+) -> None:
+    """Builds the worker's pipeline with weights backed by the shared mmap'd file."""
+    global _worker_pipe
+    import torch
+    import transformers
+    from .precision import apply_precision
+
+    torch.set_num_threads(torch_threads)
+    torch.set_num_interop_threads(1)
+
+    config = transformers.AutoConfig.from_pretrained(model_id)
+    model = getattr(transformers, model_class_name).from_config(config)
+    # mmap=True maps the file instead of reading it, and assign=True makes the
+    # parameters point at those pages, so every worker shares one page-cache
+    # copy of the weights. The randomly initialised tensors are freed here.
+    state_dict = torch.load(weights_path, mmap=True, weights_only=True)
+    model.load_state_dict(state_dict, assign=True)
+    model.tie_weights()
+    model.eval()
+    # int8 packs quantized Linear weights per worker; those copies are private but 4x smaller
+    model = apply_precision(model, precision)
+    try:
+        model.generation_config = transformers.GenerationConfig.from_pretrained(model_id)
+    except OSError:
+        pass # No generation_config.json; keep the one derived from the model config
+
+    tokenizer = transformers.AutoTokenizer.from_pretrained(model_id)
+    configure_tokenizer(tokenizer, task)
+    _worker_pipe = transformers.pipeline(task, model=model, tokenizer=tokenizer)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _run_pipeline(prompts: List[str], pipeline_kwargs: Dict[str, Any]) -> Tuple[list, float]:
+    """Runs one batched pipeline call in the worker. Returns (outputs, seconds)."""
+    import torch
+
+    start = time.perf_counter()
+    with torch.inference_mode():
+        outputs = _worker_pipe(prompts, batch_size=len(prompts), **pipeline_kwargs)
+    return outputs, time.perf_counter() - start
+
+
+class InferenceWorkerPool:
+    """N single-process executors serving one local model, outside the GIL of the API process.
+
+    Weights are exported once to ``<weights_dir>/<model>.pt`` and memory-mapped
+    by every worker, so resident memory grows by roughly one copy of the
+    weights rather than N. Each worker pins its torch intra-op thread count so
+    the workers together don't oversubscribe the CPU. Calls go to the worker
+    with the fewest outstanding requests.
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        task: str,
+        model_class_name: str,
+        precision: str,
+        num_workers: int,
+        torch_threads: int,
+        weights_dir: str,
+    ):
+        self.model_id = model_id
+        self.task = task
+        self.model_class_name = model_class_name
+        self.precision = precision
+        self.num_workers = max(1, num_workers)
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.num_workers)
+        # int8 is quantized after loading, so it shares the fp32 export
+        stored = "bf16" if precision == "bf16" else "fp32"
+        self.weights_path = os.path.join(weights_dir, f"{model_id.replace('/', '--')}.{stored}.pt")
+        self.config = None
+        self.generation_config = None
+        self._executors: List[Optional[ProcessPoolExecutor]] = [None] * self.num_workers
+        self._pending = [0] * self.num_workers
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.restarts = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=_mp_context,
+            initializer=_init_worker,
+            initargs=(
+                self.model_id, self.task, self.model_class_name, self.precision, self.weights_path, self.torch_threads,
+            ),
+        )
+
+    def start(self) -> None:
+        """Exports the shared weights if needed and starts every worker (blocking)."""
+        import transformers
+
+        # Only the small config files are loaded in the API process
+        self.config = transformers.AutoConfig.from_pretrained(self.model_id)
+        try:
+            self.generation_config = transformers.GenerationConfig.from_pretrained(self.model_id)
+        except OSError:
+            self.generation_config = transformers.GenerationConfig.from_model_config(self.config)
+
+        if not os.path.exists(self.weights_path):
+            os.makedirs(os.path.dirname(self.weights_path), exist_ok=True)
+            logger.info("Exporting shared weights for %s to %s", self.model_id, self.weights_path)
+            with ProcessPoolExecutor(max_workers=1, mp_context=_mp_context) as exporter:
+                exporter.submit(
+                    _export_weights, self.model_id, self.model_class_name, self.precision, self.weights_path
+                ).result()
+
+        for index in range(self.num_workers):
+            self._executors[index] = self._new_executor()
+        # Wait for every initializer so load errors surface here, not on the first request
+        for executor in self._executors:
+            executor.submit(_ping).result()
+        logger.info(
+            "Started %d inference workers for %s (%d torch threads each)",
+            self.num_workers, self.model_id, self.torch_threads,
+        )
+
+    def _acquire(self) -> int:
+        with self._lock:
+            index = min(range(self.num_workers), key=self._pending.__getitem__)
+            self._pending[index] += 1
+            self.requests += 1
+            return index
+
+    def _restart(self, index: int) -> None:
+        with self._lock:
+            old = self._executors[index]
+            self._executors[index] = self._new_executor()
+            self.restarts += 1
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, prompts: List[str], pipeline_kwargs: Dict[str, Any]) -> list:
+        """Runs a batched pipeline call on the least-loaded worker and returns its outputs."""
+        index = self._acquire()
+        try:
+            future = self._executors[index].submit(_run_pipeline, prompts, pipeline_kwargs)
+            outputs, elapsed = await asyncio.wrap_future(future)
+        except BrokenProcessPool as e:
+            logger.error("Inference worker %d for %s died; restarting it", index, self.model_id)
+            self._restart(index)
+            raise RuntimeError(f"Inference worker for {self.model_id} crashed") from e
+        finally:
+            with self._lock:
+                self._pending[index] -= 1
+        metrics.observe_stage(self.model_id, "generation", elapsed)
+        return outputs
+
+    def shutdown(self) -> None:
+        for executor in self._executors:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._executors = [None] * self.num_workers
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.num_workers,
+                "precision": self.precision,
+                "torch_threads": self.torch_threads,
+                "weights_path": self.weights_path,
+                "pending": list(self._pending),
+                "requests": self.requests,
+                "restarts": self.restarts,
+            }
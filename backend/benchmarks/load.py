@@ -0,0 +1,461 @@
+# backend/benchmarks/load.py
+"""
+Load tests for the chat and evaluation paths, with machine-readable results.
+
+Run from backend/:
+    # llm_service.evaluate_model, in-process, against stub providers
+    python -m benchmarks.load evaluate --models local/llama2 openai/gpt-4 --concurrency 1 8 32 --requests 200
+    # /api/chat of a backend started for the run (or --url to target a running one)
+    python -m benchmarks.load chat --models distilgpt2 --concurrency 1 4 --requests 40 --stream
+    # Compare two result files
+    python -m benchmarks.load compare results/before.json results/after.json
+
+Each concurrency level is a closed loop: that many clients send requests back
+to back until --requests have completed. Prompt lengths (in words) are drawn
+from --prompt-len, e.g. "fixed:32", "uniform:16:512" or "normal:128:40",
+with --seed making the prompt set reproducible.
+
+Reported per model and concurrency level: p50/p95/p99 latency, time to first
+token (with --stream), requests/s, output tokens/s and peak RSS of the process
+serving the requests. Output tokens are whitespace-separated words of the
+reply; for chat, the server's own count from /metrics is reported as
+server_tokens_per_s. Results go to --out as JSON together with the run
+configuration, git commit and host details.
+
+The evaluate target calls remote providers through a stub server
+(benchmarks.stub_providers) started for the run unless --stub-url is given;
+--latency shapes it the same way. Provider rate limits (PROVIDER_* settings)
+and per-model admission control (ADMISSION_* settings) stay in force unless
+--unlimited is passed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_VOCABULARY = (
+    "explain summarize translate compare describe list the a of to and in data model system network "
+    "language history science music river city energy market policy design theory example question"
+).split()
+
+
+# --- Workload ---
+
+def prompt_lengths(spec: str, count: int, rng: random.Random) -> List[int]:
+    """Draws `count` prompt lengths (words) from a distribution spec."""
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed" and len(values) == 1:
+        draw = lambda: values[0]
+    elif kind == "uniform" and len(values) == 2:
+        draw = lambda: rng.uniform(values[0], values[1])
+    elif kind == "normal" and len(values) == 2:
+        draw = lambda: rng.gauss(values[0], values[1])
+    else:
+        raise ValueError(f"Bad --prompt-len '{spec}'; use fixed:N, uniform:MIN:MAX or normal:MEAN:STD")
+    return [max(1, int(round(draw()))) for _ in range(count)]
+
+
+def make_prompts(spec: str, count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_VOCABULARY) for _ in range(n)) for n in prompt_lengths(spec, count, rng)]
+
+
+# --- Measurement ---
+
+class Sample:
+    __slots__ = ("latency_s", "ttft_s", "tokens", "error")
+
+    def __init__(self, latency_s: float, ttft_s: Optional[float], tokens: int, error: Optional[str] = None):
+        self.latency_s = latency_s
+        self.ttft_s = ttft_s
+        self.tokens = tokens
+        self.error = error
+
+
+# One request: returns (reply text, seconds to first chunk or None)
+RequestFn = Callable[[str], Awaitable[Tuple[str, Optional[float]]]]
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pct(p: float) -> float:
+        # Nearest-rank on the sorted samples
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+    return {
+        "p50": round(pct(50), 4),
+        "p95": round(pct(95), 4),
+        "p99": round(pct(99), 4),
+        "mean": round(statistics.fmean(ordered), 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+async def run_level(request: RequestFn, prompts: List[str], concurrency: int) -> Tuple[List[Sample], float]:
+    """Sends every prompt with `concurrency` clients in a closed loop. Returns the samples and wall time."""
+    queue: "asyncio.Queue[str]" = asyncio.Queue()
+    for prompt in prompts:
+        queue.put_nowait(prompt)
+    samples: List[Sample] = []
+
+    async def client():
+        while not queue.empty():
+            prompt = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                text, ttft = await request(prompt)
+                samples.append(Sample(time.perf_counter() - start, ttft, len(text.split())))
+            except Exception as e:
+                samples.append(Sample(time.perf_counter() - start, None, 0, f"{type(e).__name__}: {e}"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples: List[Sample], wall_s: float) -> Dict[str, Any]:
+    ok = [s for s in samples if s.error is None]
+    errors: Dict[str, int] = {}
+    for s in samples:
+        if s.error is not None:
+            errors[s.error[:120]] = errors.get(s.error[:120], 0) + 1
+    tokens = sum(s.tokens for s in ok)
+    return {
+        "requests": len(samples),
+        "ok": len(ok),
+        "errors": errors,
+        "wall_s": round(wall_s, 3),
+        "latency_s": percentiles([s.latency_s for s in ok]),
+        "ttft_s": percentiles([s.ttft_s for s in ok if s.ttft_s is not None]),
+        "requests_per_s": round(len(ok) / wall_s, 3) if wall_s > 0 else None,
+        "output_tokens": tokens,
+        "tokens_per_s": round(tokens / wall_s, 2) if wall_s > 0 else None,
+    }
+
+
+def _self_peak_rss() -> int:
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _process_peak_rss(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+# --- Subprocesses ---
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(url: str, timeout_s: float, proc: subprocess.Popen) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{' '.join(proc.args)} exited with {proc.returncode}")
+        try:
+            httpx.get(url, timeout=2.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout_s}s")
+
+
+def start_stub(args) -> Tuple[str, Optional[subprocess.Popen]]:
+    if args.stub_url:
+        return args.stub_url.rstrip("/"), None
+    port = _free_port()
+    cmd = [sys.executable, "-m", "benchmarks.stub_providers", "--port", str(port), "--seed", str(args.seed),
+           "--output-tokens", str(args.max_tokens), "--jitter", str(args.jitter)]
+    if args.latency:
+        cmd += ["--latency", *args.latency]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR)
+    url = f"http://127.0.0.1:{port}"
+    _wait_until_up(f"{url}/docs", 30.0, proc)
+    return url, proc
+
+
+def start_backend(args) -> Tuple[str, Optional[subprocess.Popen]]:
+    if args.url:
+        return args.url.rstrip("/"), None
+    port = _free_port()
+    env = dict(os.environ, RESPONSE_CACHE_ENABLED="false", WARMUP_MODELS=json.dumps(args.models))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    _wait_until_up(f"{url}/api/status", 60.0, proc)
+    # Models are loaded by the warm-up so load time doesn't count as request latency
+    deadline = time.monotonic() + args.timeout
+    while httpx.get(f"{url}/api/ready", timeout=5.0).status_code != 200:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Backend warm-up did not finish in time")
+        time.sleep(0.5)
+    return url, proc
+
+
+def _stop(proc: Optional[subprocess.Popen]) -> None:
+    if proc is not None:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+# --- Targets ---
+
+async def _bench_evaluate(args, prompts: List[str]) -> List[Dict[str, Any]]:
+    from app.core.config import settings
+
+    stub_url, stub = start_stub(args)
+    settings.OLLAMA_BASE_URL = stub_url
+    settings.OLLAMA_BASE_URLS = [stub_url] # Routing prefers the replica list over OLLAMA_BASE_URL
+    settings.HUGGINGFACE_API_URL = stub_url
+    settings.OPENAI_BASE_URL = f"{stub_url}/v1"
+    settings.OPENAI_API_KEY = settings.OPENAI_API_KEY or "stub"
+    settings.HUGGINGFACE_API_TOKEN = settings.HUGGINGFACE_API_TOKEN or "stub"
+    if args.unlimited:
+        settings.PROVIDER_MAX_CONCURRENCY = {p: 10_000 for p in ("openai", "huggingface", "ollama")}
+        settings.PROVIDER_RATE_PER_S = {}
+        settings.PROVIDER_MAX_QUEUE = 100_000
+        settings.ADMISSION_ENABLED = False # Per-model admission limits would shed the excess too
+
+    from app.models.evaluation import EvaluationConfig
+    from app.services import http_clients, llm_service
+
+    config = EvaluationConfig(temperature=0.7, maxTokens=args.max_tokens)
+    rows = []
+    await http_clients.startup()
+    try:
+        for model_id in args.models:
+            async def request(prompt: str) -> Tuple[str, Optional[float]]:
+                if not args.stream:
+                    return await llm_service.evaluate_model(model_id, prompt, config, use_cache=False), None
+                start = time.perf_counter() # TTFT includes the admission wait
+                return await _consume(await llm_service.stream_model(model_id, prompt, config), start)
+
+            rows += await _levels(args, model_id, request, prompts, lambda: _self_peak_rss())
+    finally:
+        await http_clients.shutdown()
+        _stop(stub)
+    return rows
+
+
+async def _consume(chunks: AsyncIterator[str], start: Optional[float] = None) -> Tuple[str, Optional[float]]:
+    start, ttft, parts = start or time.perf_counter(), None, []
+    async for chunk in chunks:
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        parts.append(chunk)
+    return "".join(parts), ttft
+
+
+async def _sse_tokens(response: httpx.Response) -> AsyncIterator[str]:
+    event = None
+    async for line in response.aiter_lines():
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data = json.loads(line[len("data:"):])
+            if event == "token":
+                yield data["token"]
+            elif event == "error":
+                raise RuntimeError(f"{data.get('status_code')}: {data.get('detail')}")
+
+
+def _server_tokens(metrics_text: str, model_id: str) -> float:
+    pattern = re.compile(r'^llmforge_generated_tokens_total\{model="' + re.escape(model_id) + r'"\} (\S+)$', re.M)
+    match = pattern.search(metrics_text)
+    return float(match.group(1)) if match else 0.0
+
+
+async def _bench_chat(args, prompts: List[str]) -> List[Dict[str, Any]]:
+    url, backend = start_backend(args)
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    rows = []
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+            for model_id in args.models:
+                async def request(prompt: str) -> Tuple[str, Optional[float]]:
+                    body = {"model_id": model_id, "message": prompt, "use_cache": False}
+                    if not args.stream:
+                        response = await client.post("/api/chat", json=body)
+                        response.raise_for_status()
+                        return response.json()["response"], None
+                    async with client.stream("POST", "/api/chat/stream", json=body) as response:
+                        response.raise_for_status()
+                        return await _consume(_sse_tokens(response))
+
+                async def scrape() -> float:
+                    return _server_tokens((await client.get("/metrics")).text, model_id)
+
+                rss = (lambda: _process_peak_rss(backend.pid)) if backend is not None else (lambda: None)
+                rows += await _levels(args, model_id, request, prompts, rss, scrape)
+    finally:
+        _stop(backend)
+    return rows
+
+
+async def _levels(args, model_id: str, request: RequestFn, prompts: List[str],
+                  peak_rss: Callable[[], Optional[int]],
+                  server_tokens: Optional[Callable[[], Awaitable[float]]] = None) -> List[Dict[str, Any]]:
+    rows = []
+    if args.warmup_requests:
+        await run_level(request, prompts[:args.warmup_requests], min(args.warmup_requests, max(args.concurrency)))
+    for concurrency in args.concurrency:
+        before = await server_tokens() if server_tokens else None
+        samples, wall_s = await run_level(request, prompts, concurrency)
+        row = {"model": model_id, "concurrency": concurrency, **summarize(samples, wall_s), "peak_rss_bytes": peak_rss()}
+        if server_tokens:
+            row["server_tokens_per_s"] = round((await server_tokens() - before) / wall_s, 2)
+        rows.append(row)
+        _print_row(row)
+    return rows
+
+
+# --- Reporting ---
+
+def _fmt(stats: Optional[Dict[str, Any]], key: str, spec: str = ".3f") -> str:
+    value = stats.get(key) if stats else None
+    return "-" if value is None else format(value, spec)
+
+
+def _print_row(row: Dict[str, Any]) -> None:
+    rss = f"{row['peak_rss_bytes'] / 2**20:.0f}" if row["peak_rss_bytes"] else "-"
+    print(
+        f"{row['model']:<28}{row['concurrency']:>5}{row['ok']:>6}/{row['requests']:<6}"
+        f"{_fmt(row['latency_s'], 'p50'):>8}{_fmt(row['latency_s'], 'p95'):>8}{_fmt(row['latency_s'], 'p99'):>8}"
+        f"{_fmt(row['ttft_s'], 'p50'):>9}{_fmt(row, 'requests_per_s', ''):>8}{_fmt(row, 'tokens_per_s', ''):>9}{rss:>8}",
+        flush=True,
+    )
+
+
+def _print_header() -> None:
+    print(f"{'model':<28}{'conc':>5}{'ok/total':>13}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}"
+          f"{'ttft50':>9}{'req/s':>8}{'tok/s':>9}{'RSS MB':>8}")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """Prints the relative change of each metric for rows present in both result files."""
+    with open(before_path, encoding="utf-8") as f:
+        before = {(r["model"], r["concurrency"]): r for r in json.load(f)["results"]}
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)["results"]
+
+    def change(old, new) -> str:
+        if not old or new is None:
+            return "-"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"{'model':<28}{'conc':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'ttft50':>9}{'req/s':>9}{'tok/s':>9}")
+    for row in after:
+        old = before.get((row["model"], row["concurrency"]))
+        if old is None:
+            continue
+        lat = [change((old["latency_s"] or {}).get(k), (row["latency_s"] or {}).get(k)) for k in ("p50", "p95", "p99")]
+        ttft = change((old["ttft_s"] or {}).get("p50"), (row["ttft_s"] or {}).get("p50"))
+        print(f"{row['model']:<28}{row['concurrency']:>5}{lat[0]:>9}{lat[1]:>9}{lat[2]:>9}{ttft:>9}"
+              f"{change(old['requests_per_s'], row['requests_per_s']):>9}{change(old['tokens_per_s'], row['tokens_per_s']):>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the chat and evaluation paths.")
+    sub = parser.add_subparsers(dest="target", required=True)
+
+    def common(p: argparse.ArgumentParser, default_models: List[str]) -> None:
+        p.add_argument("--models", nargs="+", default=default_models)
+        p.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+        p.add_argument("--requests", type=int, default=100, help="Requests per model and concurrency level")
+        p.add_argument("--warmup-requests", type=int, default=2, help="Unmeasured requests per model first")
+        p.add_argument("--prompt-len", default="uniform:16:256", help="Prompt length distribution in words")
+        p.add_argument("--max-tokens", type=int, default=64, help="Reply length bound sent with each request")
+        p.add_argument("--stream", action="store_true", help="Use the streaming path and measure time to first token")
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--timeout", type=float, default=600.0)
+        p.add_argument("--out", help="Write the results as JSON to this file")
+
+    evaluate = sub.add_parser("evaluate", help="llm_service.evaluate_model against stub providers (in-process)")
+    common(evaluate, ["local/llama2", "huggingface/mistralai/Mistral-7B-Instruct-v0.2", "openai/gpt-3.5-turbo"])
+    evaluate.add_argument("--stub-url", help="Use a running benchmarks.stub_providers server")
+    evaluate.add_argument("--latency", nargs="*", default=[], metavar="PROVIDER=TTFT:TOK_PER_S")
+    evaluate.add_argument("--jitter", type=float, default=0.1)
+    evaluate.add_argument("--unlimited", action="store_true", help="Lift the PROVIDER_* concurrency/rate limits and admission control")
+
+    chat = sub.add_parser("chat", help="/api/chat of a backend process")
+    common(chat, ["distilgpt2"])
+    chat.add_argument("--url", help="Target a running backend instead of starting one (peak RSS is then unknown)")
+
+    cmp = sub.add_parser("compare", help="Compare two result files")
+    cmp.add_argument("before")
+    cmp.add_argument("after")
+
+    args = parser.parse_args()
+    if args.target == "compare":
+        compare(args.before, args.after)
+        return
+    if args.target == "chat":
+        # chat's max_new_tokens comes from the model registry, not the request
+        args.max_tokens = None
+
+    prompts = make_prompts(args.prompt_len, args.requests, args.seed)
+    _print_header()
+    run = _bench_evaluate if args.target == "evaluate" else _bench_chat
+    started_at = time.time()
+    results = asyncio.run(run(args, prompts))
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        report = {
+            "target": args.target,
+            "started_at": started_at,
+            "git_commit": _git_commit(),
+            "host": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "config": {k: v for k, v in vars(args).items() if k not in ("out",)},
+            "results": results,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# backend/benchmarks/precision.py
+"""
+Compares load modes (fp32 / bf16 / int8) of a local model: load time, weight
+memory, generation throughput and output drift against fp32.
+
+Run from backend/:
+    python -m benchmarks.precision --model distilgpt2
+    python -m benchmarks.precision --model google/flan-t5-small --modes fp32 int8 --json results.json
+
+Generation is greedy so outputs are comparable across modes. Drift is
+reported as the share of prompts whose output matches fp32 exactly, the mean
+character-level similarity of the outputs, and the top-1 agreement / max
+absolute difference of the first-step logits.
+"""
+import argparse
+import difflib
+import gc
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import torch
+from transformers import AutoTokenizer
+
+from app.core.config import get_model_config
+from app.services.chat_service import _task_for
+from app.services.model_cache import estimate_pipeline_bytes
+from app.services.precision import PRECISIONS, apply_precision, load_kwargs
+
+DEFAULT_PROMPTS = [
+    "Translate English to German: The weather is nice today.",
+    "Summarize: Large language models are trained on huge text corpora and can be adapted to many tasks.",
+    "What is the capital of France?",
+    "Write a short sentence about the ocean.",
+    "Explain why the sky is blue in one sentence.",
+    "List three fruits:",
+    "The quick brown fox",
+    "Once upon a time, in a small village,",
+]
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _load(model_id: str, precision: str):
+    _, model_class = _task_for(model_id)
+    model = model_class.from_pretrained(model_id, **load_kwargs(precision))
+    model = apply_precision(model, precision)
+    model.eval()
+    return model
+
+
+def _first_step_logits(model, tokenizer, prompts: List[str]) -> torch.Tensor:
+    """Logits of the first generated position for each prompt, as fp32."""
+    rows = []
+    for prompt in prompts:
+        inputs = tokenizer(prompt, return_tensors="pt")
+        if model.config.is_encoder_decoder:
+            start = torch.full((1, 1), model.config.decoder_start_token_id, dtype=torch.long)
+            logits = model(**inputs, decoder_input_ids=start).logits
+        else:
+            logits = model(**inputs).logits
+        rows.append(logits[0, -1].float())
+    return torch.stack(rows)
+
+
+def _generate(model, tokenizer, prompts: List[str], max_new_tokens: int):
+    """Greedy generation, one prompt at a time. Returns (texts, new token count, seconds)."""
+    texts, tokens = [], 0
+    start = time.perf_counter()
+    for prompt in prompts:
+        inputs = tokenizer(prompt, return_tensors="pt")
+        output = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.pad_token_id or tokenizer.eos_token_id,
+        )
+        new_ids = output[0] if model.config.is_encoder_decoder else output[0, inputs["input_ids"].shape[-1]:]
+        tokens += new_ids.shape[-1]
+        texts.append(tokenizer.decode(new_ids, skip_special_tokens=True).strip())
+    return texts, tokens, time.perf_counter() - start
+
+
+def run(model_id: str, modes: List[str], prompts: List[str], max_new_tokens: int, threads: Optional[int]) -> List[Dict]:
+    if threads:
+        torch.set_num_threads(threads)
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    results = []
+    reference_texts, reference_logits = None, None
+
+    # fp32 is always measured first as the drift reference
+    for precision in ["fp32"] + [m for m in modes if m != "fp32"]:
+        gc.collect()
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model = _load(model_id, precision)
+        load_s = time.perf_counter() - start
+        rss_after = _rss_bytes()
+
+        with torch.inference_mode():
+            _generate(model, tokenizer, prompts[:1], max_new_tokens) # Warm-up
+            texts, tokens, gen_s = _generate(model, tokenizer, prompts, max_new_tokens)
+            logits = _first_step_logits(model, tokenizer, prompts)
+
+        row = {
+            "precision": precision,
+            "load_s": round(load_s, 2),
+            "weight_bytes": estimate_pipeline_bytes(model),
+            "rss_delta_bytes": (rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+            "tokens": tokens,
+            "generate_s": round(gen_s, 3),
+            "tokens_per_s": round(tokens / gen_s, 1) if gen_s > 0 else None,
+        }
+        if reference_texts is None:
+            reference_texts, reference_logits = texts, logits
+        row["exact_match"] = sum(a == b for a, b in zip(texts, reference_texts)) / len(prompts)
+        row["similarity"] = round(
+            sum(difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(texts, reference_texts)) / len(prompts), 4
+        )
+        row["top1_agreement"] = (logits.argmax(-1) == reference_logits.argmax(-1)).float().mean().item()
+        row["max_logit_diff"] = round((logits - reference_logits).abs().max().item(), 4)
+
+        if precision in modes:
+            results.append(row)
+        del model
+        gc.collect()
+    return results
+
+
+def _print_table(model_id: str, results: List[Dict]) -> None:
+    print(f"\nModel: {model_id}")
+    header = f"{'mode':<6}{'load s':>8}{'weights MB':>12}{'RSS +MB':>10}{'tok/s':>9}{'exact':>8}{'sim':>8}{'top1':>8}{'max dlogit':>12}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        rss = f"{r['rss_delta_bytes'] / 2**20:.0f}" if r["rss_delta_bytes"] is not None else "n/a"
+        print(
+            f"{r['precision']:<6}{r['load_s']:>8}{r['weight_bytes'] / 2**20:>12.1f}{rss:>10}"
+            f"{r['tokens_per_s']:>9}{r['exact_match']:>8.2f}{r['similarity']:>8.3f}"
+            f"{r['top1_agreement']:>8.2f}{r['max_logit_diff']:>12}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark fp32/bf16/int8 load modes of a local model.")
+    parser.add_argument("--model", default="distilgpt2", help="Model ID (any Hugging Face seq2seq or causal LM)")
+    parser.add_argument("--modes", nargs="+", choices=PRECISIONS, default=list(PRECISIONS))
+    parser.add_argument("--prompts-file", help="Text file with one prompt per line (default: built-in set)")
+    parser.add_argument("--max-new-tokens", type=int, default=None, help="Default: the model's pipeline_kwargs or 50")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    prompts = DEFAULT_PROMPTS
+    if args.prompts_file:
+        with open(args.prompts_file, encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()]
+    max_new_tokens = args.max_new_tokens
+    if max_new_tokens is None:
+        max_new_tokens = ((get_model_config(args.model) or {}).get("pipeline_kwargs") or {}).get("max_new_tokens", 50)
+
+    results = run(args.model, args.modes, prompts, max_new_tokens, args.threads)
+    _print_table(args.model, results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "max_new_tokens": max_new_tokens, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
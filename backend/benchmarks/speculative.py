@@ -0,0 +1,144 @@
+# backend/benchmarks/speculative.py
+"""
+Checks assisted (speculative) decoding of a local causal model against plain
+decoding: greedy outputs must be token-for-token identical, and the run
+reports the wall-clock speedup and the draft acceptance rate. The assisted
+pipeline is set up with the service's speculative.enable, so this measures
+the code path chat requests take.
+
+Run from backend/:
+    python -m benchmarks.speculative --model gpt2-medium --draft distilgpt2
+    python -m benchmarks.speculative --model gpt2-large --draft distilgpt2 --assistant-tokens 3 5 8 --json spec.json
+
+--draft defaults to the model's draft_model in the model registry. Each
+mode generates every prompt once as a warm-up, then --repeats timed rounds.
+The exit status is 1 if any output differs from plain decoding.
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+
+from app.core.config import get_model_config
+from app.services import speculative
+from benchmarks.precision import DEFAULT_PROMPTS
+
+
+def _count_new_tokens(model_outputs: Dict[str, Any]) -> int:
+    """New tokens in one text-generation forward call (the sequence includes the prompt)."""
+    return model_outputs["generated_sequence"].shape[-1] - model_outputs["input_ids"].shape[-1]
+
+
+def _generate_all(pipe, prompts: List[str], max_new_tokens: int) -> Dict:
+    """Greedy generation of every prompt; returns new token ids, timing and forward-pass counts."""
+    outputs, tokens, seconds = [], 0, 0.0
+    counts = {"target": 0, "draft": 0}
+    for prompt in prompts:
+        prompt_len = len(pipe.tokenizer(prompt, add_special_tokens=False)["input_ids"])
+        with speculative.counting() as calls:
+            start = time.perf_counter()
+            output = pipe(
+                prompt,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                return_tensors=True,
+                pad_token_id=pipe.tokenizer.eos_token_id,
+            )
+            seconds += time.perf_counter() - start
+        for field, n in calls.items():
+            counts[field] += n
+        new_ids = list(output[0]["generated_token_ids"][prompt_len:])
+        outputs.append(new_ids)
+        tokens += len(new_ids)
+    return {"outputs": outputs, "tokens": tokens, "seconds": seconds, **counts}
+
+
+def run(model_id: str, draft_id: str, assistant_tokens: List[Optional[int]], prompts: List[str],
+        max_new_tokens: int, repeats: int, threads: Optional[int]) -> List[Dict]:
+    if threads:
+        torch.set_num_threads(threads)
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForCausalLM.from_pretrained(model_id).eval()
+    draft = AutoModelForCausalLM.from_pretrained(draft_id).eval()
+    # Both pipelines share the target model; only `assisted` goes through the service's speculative.enable
+    plain_pipe = pipeline("text-generation", model=model, tokenizer=tokenizer)
+    assisted_pipe = pipeline("text-generation", model=model, tokenizer=tokenizer)
+    speculative.enable(assisted_pipe, draft, model_id, _count_new_tokens)
+
+    results = []
+    with torch.inference_mode():
+        _generate_all(plain_pipe, prompts, max_new_tokens) # Warm-up
+        plain = [_generate_all(plain_pipe, prompts, max_new_tokens) for _ in range(repeats)]
+        baseline_s = min(r["seconds"] for r in plain)
+        reference = plain[0]["outputs"]
+        results.append({"mode": "plain", "tokens_per_s": round(plain[0]["tokens"] / baseline_s, 1),
+                        "seconds": round(baseline_s, 3), "speedup": 1.0, "identical": True,
+                        "acceptance_rate": None, "tokens_per_target_pass": 1.0})
+
+        for n in assistant_tokens:
+            if n:
+                draft.generation_config.num_assistant_tokens = n
+            _generate_all(assisted_pipe, prompts, max_new_tokens) # Warm-up
+            runs = [_generate_all(assisted_pipe, prompts, max_new_tokens) for _ in range(repeats)]
+            best = min(runs, key=lambda r: r["seconds"])
+            accepted = max(0, best["tokens"] - best["target"])
+            results.append({
+                "mode": f"assisted k={draft.generation_config.num_assistant_tokens}",
+                "tokens_per_s": round(best["tokens"] / best["seconds"], 1),
+                "seconds": round(best["seconds"], 3),
+                "speedup": round(baseline_s / best["seconds"], 2),
+                "identical": all(r["outputs"] == reference for r in runs),
+                "acceptance_rate": round(min(accepted, best["draft"]) / best["draft"], 3) if best["draft"] else None,
+                "tokens_per_target_pass": round(best["tokens"] / best["target"], 2) if best["target"] else None,
+            })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare assisted decoding with a draft model against plain decoding.")
+    parser.add_argument("--model", default="gpt2-medium", help="Target causal model ID")
+    parser.add_argument("--draft", help="Draft model ID (default: the registry's draft_model for --model)")
+    parser.add_argument("--assistant-tokens", nargs="+", type=int, default=[0],
+                        help="Draft tokens per round to try (0 = the registry/transformers default)")
+    parser.add_argument("--prompts-file", help="Text file with one prompt per line (default: built-in set)")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3, help="Timed rounds per mode (fastest is reported)")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    model_config = get_model_config(args.model) or {}
+    draft_id = args.draft or model_config.get("draft_model")
+    if not draft_id:
+        parser.error(f"No --draft given and {args.model} has no draft_model in the registry")
+    assistant_tokens = [n or model_config.get("num_assistant_tokens") or 0 for n in args.assistant_tokens]
+    prompts = DEFAULT_PROMPTS
+    if args.prompts_file:
+        with open(args.prompts_file, encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()]
+
+    results = run(args.model, draft_id, assistant_tokens, prompts, args.max_new_tokens, args.repeats, args.threads)
+
+    print(f"\nTarget: {args.model}  Draft: {draft_id}  ({len(prompts)} prompts, {args.max_new_tokens} new tokens, greedy)")
+    header = f"{'mode':<16}{'tok/s':>8}{'seconds':>9}{'speedup':>9}{'accept':>8}{'tok/pass':>10}{'identical':>11}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        accept = f"{r['acceptance_rate']:.2f}" if r["acceptance_rate"] is not None else "-"
+        print(f"{r['mode']:<16}{r['tokens_per_s']:>8}{r['seconds']:>9}{r['speedup']:>9}{accept:>8}"
+              f"{r['tokens_per_target_pass']:>10}{str(r['identical']):>11}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "draft": draft_id, "max_new_tokens": args.max_new_tokens,
+                       "results": results}, f, indent=2)
+    if not all(r["identical"] for r in results):
+        print("\nAssisted decoding changed greedy output.", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# backend/benchmarks/startup.py
+"""
+Measures cold-start cost of the backend: import time of the app, and how long
+the first chat request for a local model takes with and without the startup
+warm-up (WARMUP_MODELS).
+
+Run from backend/:
+    python -m benchmarks.startup --model distilgpt2
+    python -m benchmarks.startup --model google/flan-t5-small --runs 3 --json startup.json
+
+Scenarios:
+  import        - `import app.main` in a fresh interpreter, with the ML stack
+                  imported lazily (current) and eagerly (transformers imported
+                  up front, as chat_service used to do)
+  no-warmup     - server started without warm-up; the first /api/chat request
+                  pays the model load inline
+  warmup        - server started with WARMUP_MODELS=[model]; the first request
+                  is sent once /api/ready answers 200
+
+Each server scenario starts uvicorn in a subprocess on a free port. Model
+files should already be in the Hugging Face cache so download time doesn't
+dominate (run the benchmark once to populate it).
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+{pre}
+import app.main
+print(time.perf_counter() - start, int("torch" in sys.modules))
+"""
+
+
+def _import_time(eager: bool) -> Dict:
+    probe = _IMPORT_PROBE.format(pre="import transformers" if eager else "")
+    out = subprocess.run(
+        [sys.executable, "-c", probe], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout.split()
+    return {"import_s": float(out[-2]), "torch_loaded": bool(int(out[-1]))}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(client: httpx.Client, url: str, deadline: float) -> Optional[float]:
+    """Polls url until it returns 200; returns the time it did, or None on timeout."""
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def _server_run(model_id: str, warmup: bool, timeout_s: float) -> Dict:
+    port = _free_port()
+    env = dict(os.environ, WARMUP_MODELS=json.dumps([model_id] if warmup else []), RESPONSE_CACHE_ENABLED="false")
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        with httpx.Client(timeout=timeout_s) as client:
+            deadline = start + timeout_s
+            live = _wait_for(client, f"{base}/api/status", deadline)
+            ready = _wait_for(client, f"{base}/api/ready", deadline)
+            if live is None or ready is None:
+                raise RuntimeError(f"Server did not become ready within {timeout_s}s")
+            request_start = time.perf_counter()
+            response = client.post(f"{base}/api/chat", json={"model_id": model_id, "message": "Hello", "use_cache": False})
+            response.raise_for_status()
+            done = time.perf_counter()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return {
+        "live_s": live - start,
+        "ready_s": ready - start,
+        "first_request_s": done - request_start,
+        "first_response_s": done - start,
+    }
+
+
+def _median(rows: List[Dict]) -> Dict:
+    return {key: round(statistics.median(r[key] for r in rows), 3) for key in rows[0]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark backend startup and first-request latency.")
+    parser.add_argument("--model", default="distilgpt2", help="Local model ID from the model registry")
+    parser.add_argument("--runs", type=int, default=1, help="Repetitions per scenario (medians are reported)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for a server")
+    parser.add_argument("--skip-server", action="store_true", help="Only measure import time")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = {
+        "import_lazy": _median([_import_time(eager=False) for _ in range(args.runs)]),
+        "import_eager": _median([_import_time(eager=True) for _ in range(args.runs)]),
+    }
+    print("\nImport of app.main")
+    for name in ("import_lazy", "import_eager"):
+        r = results[name]
+        print(f"  {name[7:]:<6} {r['import_s']:>7.2f}s  torch loaded: {bool(r['torch_loaded'])}")
+
+    if not args.skip_server:
+        for name, warmup in (("no-warmup", False), ("warmup", True)):
+            results[name] = _median([_server_run(args.model, warmup, args.timeout) for _ in range(args.runs)])
+        print(f"\nServer start, model {args.model} (seconds from process start unless noted)")
+        print(f"{'scenario':<11}{'live':>8}{'ready':>8}{'1st req':>9}{'1st resp':>10}")
+        for name in ("no-warmup", "warmup"):
+            r = results[name]
+            print(f"{name:<11}{r['live_s']:>8.2f}{r['ready_s']:>8.2f}{r['first_request_s']:>9.2f}{r['first_response_s']:>10.2f}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "runs": args.runs, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
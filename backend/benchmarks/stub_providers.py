@@ -0,0 +1,187 @@
+# backend/benchmarks/stub_providers.py
+"""
+Local stand-ins for the Ollama, Hugging Face Inference and OpenAI APIs, for
+load tests that must not depend on (or pay for) the real services.
+
+One server answers all three APIs:
+    POST /api/generate            Ollama (JSON, or NDJSON when "stream": true)
+    POST /models/{model_id}       Hugging Face Inference (JSON, or SSE when "stream": true)
+    POST /v1/chat/completions     OpenAI chat completions (JSON, or SSE when "stream": true)
+
+Each provider has a simulated time-to-first-token and decode speed; every
+delay gets +/- `jitter` uniform noise. Replies are `min(max tokens requested,
+--output-tokens)` words long.
+
+Run from backend/ (benchmarks.load starts it automatically):
+    python -m benchmarks.stub_providers --port 9100 --latency openai=0.2:80
+Then point the backend at it:
+    OLLAMA_BASE_URL=http://127.0.0.1:9100  HUGGINGFACE_API_URL=http://127.0.0.1:9100
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1  (with any non-empty API key/token)
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# provider -> (time to first token in s, tokens per second)
+DEFAULT_LATENCY: Dict[str, Tuple[float, float]] = {
+    "ollama": (0.25, 30.0),
+    "huggingface": (0.4, 40.0),
+    "openai": (0.35, 60.0),
+}
+
+_WORDS = "the model answers with a short and plausible sentence about the prompt it was given".split()
+
+
+class StubConfig:
+    def __init__(
+        self,
+        latency: Dict[str, Tuple[float, float]],
+        output_tokens: int = 64,
+        jitter: float = 0.1,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.output_tokens = output_tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+    def _noisy(self, seconds: float) -> float:
+        return max(0.0, seconds * self.rng.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def ttft(self, provider: str) -> float:
+        return self._noisy(self.latency[provider][0])
+
+    def token_interval(self, provider: str) -> float:
+        tokens_per_s = self.latency[provider][1]
+        return self._noisy(1.0 / tokens_per_s) if tokens_per_s > 0 else 0.0
+
+    def tokens(self, requested: Optional[int]) -> List[str]:
+        n = min(requested or self.output_tokens, self.output_tokens)
+        return [_WORDS[i % len(_WORDS)] + " " for i in range(max(1, n))]
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+
+async def _emit(config: StubConfig, provider: str, tokens: List[str]) -> AsyncIterator[str]:
+    """Yields tokens at the provider's simulated pace."""
+    await asyncio.sleep(config.ttft(provider))
+    for i, token in enumerate(tokens):
+        if i:
+            await asyncio.sleep(config.token_interval(provider))
+        yield token
+
+
+async def _complete(config: StubConfig, provider: str, tokens: List[str]) -> str:
+    await asyncio.sleep(config.ttft(provider) + sum(config.token_interval(provider) for _ in tokens[1:]))
+    return "".join(tokens)
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="LLM-Forge provider stubs")
+
+    def _unavailable() -> JSONResponse:
+        return JSONResponse({"error": "Simulated provider error"}, status_code=503)
+
+    @app.post("/api/generate")
+    async def ollama_generate(request: Request):
+        body = await request.json()
+        if config.should_fail():
+            return _unavailable()
+        tokens = config.tokens((body.get("options") or {}).get("num_predict"))
+        if not body.get("stream", True): # Ollama streams unless told otherwise
+            text = await _complete(config, "ollama", tokens)
+            return {"model": body.get("model"), "response": text, "done": True, "eval_count": len(tokens)}
+
+        async def ndjson():
+            async for token in _emit(config, "ollama", tokens):
+                yield json.dumps({"model": body.get("model"), "response": token, "done": False}) + "\n"
+            yield json.dumps({"model": body.get("model"), "response": "", "done": True, "eval_count": len(tokens)}) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    @app.post("/models/{model_id:path}")
+    async def huggingface_inference(model_id: str, request: Request):
+        body = await request.json()
+        if config.should_fail():
+            return _unavailable()
+        tokens = config.tokens((body.get("parameters") or {}).get("max_new_tokens"))
+        if not body.get("stream"):
+            return [{"generated_text": await _complete(config, "huggingface", tokens)}]
+
+        async def sse():
+            async for token in _emit(config, "huggingface", tokens):
+                yield f"data: {json.dumps({'token': {'text': token, 'special': False}})}\n\n"
+        return StreamingResponse(sse(), media_type="text/event-stream")
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat_completions(request: Request):
+        body = await request.json()
+        if config.should_fail():
+            return _unavailable()
+        tokens = config.tokens(body.get("max_tokens"))
+        completion_id, created, model = f"chatcmpl-{uuid.uuid4().hex}", int(time.time()), body.get("model")
+        if not body.get("stream"):
+            text = await _complete(config, "openai", tokens)
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            }
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> str:
+            data = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def sse():
+            async for token in _emit(config, "openai", tokens):
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(sse(), media_type="text/event-stream")
+
+    return app
+
+
+def parse_latency(specs: List[str]) -> Dict[str, Tuple[float, float]]:
+    """Parses overrides like 'openai=0.2:80' (TTFT seconds : tokens per second)."""
+    latency = dict(DEFAULT_LATENCY)
+    for spec in specs:
+        provider, _, values = spec.partition("=")
+        if provider not in latency:
+            raise ValueError(f"Unknown provider '{provider}'; expected one of {', '.join(latency)}")
+        ttft, _, tokens_per_s = values.partition(":")
+        latency[provider] = (float(ttft), float(tokens_per_s or latency[provider][1]))
+    return latency
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve stub Ollama / Hugging Face / OpenAI APIs with simulated latency.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", nargs="*", default=[], metavar="PROVIDER=TTFT:TOK_PER_S")
+    parser.add_argument("--output-tokens", type=int, default=64, help="Upper bound on reply length in tokens")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Relative +/- noise on every delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(parse_latency(args.latency), args.output_tokens, args.jitter, args.error_rate, args.seed)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,7 +27,7 @@ function ChatPage() {
 
   // Fetch models on component mount
   useEffect(() => {
-    axios.get<{ id: string; name: string }[]>(`${API_BASE_URL}/models`)
+    axios.get<{ id: string; name: string }[]>(`${API_BASE_URL}/models?runtime=transformers`)
       .then(response => {
         setModels(response.data);
         // Select the first model by default if available